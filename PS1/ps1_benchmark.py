@@ -0,0 +1,279 @@
+# Benchmarks for the cow transport algorithms of Problem Set 1a.
+#
+# Generates synthetic herds with a fixed seed, times every algorithm on each
+# of them and writes one row per (algorithm, herd) to CSV and/or JSON, e.g.
+#
+#   python ps1_benchmark.py --sizes 10,50,200 --distribution uniform \
+#       --repeat 5 --csv bench.csv --json bench.json
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+
+try:
+    from time import perf_counter
+except ImportError:
+    from timeit import default_timer as perf_counter
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# bytes per unit of ru_maxrss (kilobytes on Linux, bytes on macOS)
+RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+import ps1a
+
+# seconds branch and bound may search for one herd by default
+TIME_LIMIT = 10
+
+
+def greedy(cows, limit, time_limit=None):
+    return ps1a.greedy_cow_transport(cows, limit), False
+
+
+def brute_force(cows, limit, time_limit=None):
+    return ps1a.brute_force_cow_transport(cows, limit), True
+
+
+def branch_and_bound(cows, limit, time_limit=None):
+    return ps1a.branch_and_bound_search(cows, limit, time_limit=time_limit)
+
+
+# name, function, largest herd it is run on (None for no limit). Each
+# function takes (cows, limit, time_limit) and returns a tuple (trips,
+# whether they are proven to be the fewest possible).
+ALGORITHMS = [
+    ("greedy", greedy, None),
+    ("brute_force", brute_force, 12),
+    ("branch_and_bound", branch_and_bound, None),
+]
+
+FIELDS = ["algorithm", "size", "distribution", "limit", "seed", "trips",
+          "optimal", "best_known", "lower_bound", "gap", "best_seconds",
+          "mean_seconds", "peak_bytes", "memory_method"]
+
+
+def generate_herd(size, limit=10, distribution="uniform", seed=0):
+    """
+    Builds a synthetic herd whose weights are drawn from the given
+    distribution with a fixed seed, so the same arguments always give the
+    same herd.
+
+    Parameters:
+    size - number of cows (an int)
+    limit - weight limit of the spaceship (an int)
+    distribution - "uniform" (1..limit), "light" (1..limit/3), "heavy"
+        (limit/2..limit), "normal" (around limit/2) or "medium"
+        (limit/5..limit/2, two to five cows a trip, the hardest herds to
+        prove optimal)
+    seed - seed of the random generator (an int)
+
+    Returns:
+    a dictionary of cow name (string), weight (int) pairs
+    """
+    rng = random.Random(seed)
+    if distribution == "uniform":
+        draw = lambda: rng.randint(1, limit)
+    elif distribution == "light":
+        draw = lambda: rng.randint(1, max(1, limit // 3))
+    elif distribution == "heavy":
+        draw = lambda: rng.randint(max(1, limit // 2), limit)
+    elif distribution == "medium":
+        draw = lambda: rng.randint(max(1, limit // 5), max(1, limit // 2))
+    elif distribution == "normal":
+        draw = lambda: min(limit, max(1, int(round(
+            rng.gauss(limit / 2.0, limit / 6.0)))))
+    else:
+        raise ValueError("unknown distribution " + str(distribution))
+    return dict(("cow" + str(i), draw()) for i in range(size))
+
+
+def time_algorithm(algorithm, cows, limit, repeat=3):
+    """
+    Runs algorithm(cows, limit) repeat times.
+
+    Returns:
+    A tuple (result of the last run, list of run times in seconds)
+    """
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        result = algorithm(cows, limit)
+        times.append(perf_counter() - start)
+    return result, times
+
+
+def peak_memory(algorithm, cows, limit):
+    """
+    Returns a tuple (peak bytes, method) for one run of
+    algorithm(cows, limit). With tracemalloc (not on Python 2) the bytes
+    are the peak of the Python heap and the method is "tracemalloc"; else
+    they come from forked_peak_memory and the method is "ru_maxrss"; else
+    both are None.
+    """
+    if tracemalloc is None:
+        peak = forked_peak_memory(algorithm, cows, limit)
+        return peak, None if peak is None else "ru_maxrss"
+    tracemalloc.start()
+    try:
+        algorithm(cows, limit)
+        return tracemalloc.get_traced_memory()[1], "tracemalloc"
+    finally:
+        tracemalloc.stop()
+
+
+def no_op(cows, limit):
+    return []
+
+
+# herd every algorithm is run on before measuring, so pages touched by any
+# run at all (code, caches, copy-on-write faults) are not counted
+WARM_UP_HERD = {"warm up 0": 1, "warm up 1": 1}
+
+
+def rss_growth(algorithm, cows, limit):
+    """
+    Runs algorithm(cows, limit) in a forked child, after a first run on
+    WARM_UP_HERD, and returns how much the child's peak resident memory
+    (ru_maxrss) grew during the second run, in bytes. Returns None where
+    fork or the resource module is missing or the child fails.
+    """
+    if resource is None or not hasattr(os, "fork"):
+        return None
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read)
+            algorithm(dict(WARM_UP_HERD), limit)
+            before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            algorithm(cows, limit)
+            after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            os.write(write, str((after - before) * RSS_UNIT).encode())
+        finally:
+            os._exit(0)
+    os.close(write)
+    with os.fdopen(read) as inFile:
+        data = inFile.read()
+    os.waitpid(pid, 0)
+    return int(data) if data else None
+
+
+def forked_peak_memory(algorithm, cows, limit):
+    """
+    Returns rss_growth of algorithm(cows, limit) less that of no_op
+    measured the same way, in bytes, or None if either is unavailable. This
+    counts whole pages rather than objects, so small runs may report 0.
+    """
+    growth = rss_growth(algorithm, cows, limit)
+    baseline = rss_growth(no_op, cows, limit)
+    if growth is None or baseline is None:
+        return None
+    return max(0, growth - baseline)
+
+
+def run_benchmarks(sizes, limit=10, distribution="uniform", seed=0,
+                   repeat=3, algorithms=ALGORITHMS, time_limit=TIME_LIMIT):
+    """
+    Benchmarks every algorithm on one generated herd per size, giving
+    branch and bound time_limit seconds per run (None for no limit). The
+    gap of an algorithm is the number of trips it uses over the fewest
+    trips any algorithm found for that herd; a row is optimal when its trips
+    are proven to be the fewest possible (by the algorithm, or by meeting
+    the lower bound), so a gap of 0 on a herd without an optimal row only
+    means no algorithm did better.
+
+    Returns:
+    A list of dictionaries keyed by FIELDS, one per (algorithm, herd) run
+    """
+    rows = []
+    for size in sizes:
+        cows = generate_herd(size, limit, distribution, seed)
+        lower = ps1a.trip_lower_bound(list(cows.values()), limit)
+        herd_rows = []
+        for name, algorithm, largest in algorithms:
+            if largest is not None and size > largest:
+                continue
+            run = lambda cows, limit: algorithm(cows, limit, time_limit)
+            # measured first, while the timed runs have not yet grown the
+            # heap the forked child would inherit
+            peak, method = peak_memory(run, cows, limit)
+            (trips, optimal), times = time_algorithm(run, cows, limit,
+                                                     repeat)
+            herd_rows.append({
+                "algorithm": name,
+                "size": size,
+                "distribution": distribution,
+                "limit": limit,
+                "seed": seed,
+                "trips": len(trips),
+                "optimal": optimal or len(trips) == lower,
+                "lower_bound": lower,
+                "best_seconds": min(times),
+                "mean_seconds": sum(times) / len(times),
+                "peak_bytes": peak,
+                "memory_method": method,
+            })
+        best = min(row["trips"] for row in herd_rows)
+        for row in herd_rows:
+            row["best_known"] = best
+            row["gap"] = row["trips"] - best
+        rows.extend(herd_rows)
+    return rows
+
+
+def dump_csv(rows, outFile):
+    writer = csv.DictWriter(outFile, fieldnames=FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+
+
+def write_csv(rows, filename):
+    with open(filename, "w") as outFile:
+        dump_csv(rows, outFile)
+
+
+def write_json(rows, filename):
+    with open(filename, "w") as outFile:
+        json.dump(rows, outFile, indent=2, sort_keys=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the cow transport algorithms.")
+    parser.add_argument("--sizes", default="8,12,50,200",
+                        help="comma-separated herd sizes")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--distribution", default="uniform",
+                        choices=["uniform", "light", "heavy", "normal",
+                                 "medium"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--time-limit", type=float, default=TIME_LIMIT,
+                        help="seconds branch and bound may search a herd")
+    parser.add_argument("--csv", help="file to write the results as CSV")
+    parser.add_argument("--json", help="file to write the results as JSON")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    rows = run_benchmarks(sizes, args.limit, args.distribution, args.seed,
+                          args.repeat, time_limit=args.time_limit)
+    if args.csv:
+        write_csv(rows, args.csv)
+    if args.json:
+        write_json(rows, args.json)
+    if not (args.csv or args.json):
+        dump_csv(rows, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,3 +14,46 @@ def partitions(set_):
 def get_partitions(set_):
     for partition in partitions(set_):
         yield [list(elt) for elt in partition]
+
+# Yields the partitions of set_ whose blocks weigh at most limit, fewest
+# blocks first. Items are placed heaviest first and a block is abandoned
+# as soon as it would go over the limit, so only O(n) state is kept and
+# infeasible partitions are never built.
+def feasible_partitions(set_, weights, limit):
+    items = sorted(set_, key=lambda item: int(weights[item]), reverse=True)
+    sizes = [int(weights[item]) for item in items]
+    blocks = []
+    loads = []
+
+    def place(i, k, left, room):
+        if i == len(items):
+            if len(blocks) == k:
+                yield [list(block) for block in blocks]
+            return
+        # not enough items to open k blocks, or not enough room for them
+        if len(blocks) + len(items) - i < k:
+            return
+        if left > room + (k - len(blocks)) * limit:
+            return
+        item, size = items[i], sizes[i]
+        for j in range(len(blocks)):
+            if loads[j] + size <= limit:
+                blocks[j].append(item)
+                loads[j] += size
+                for partition in place(i + 1, k, left - size, room - size):
+                    yield partition
+                loads[j] -= size
+                blocks[j].pop()
+        if len(blocks) < k and size <= limit:
+            blocks.append([item])
+            loads.append(size)
+            for partition in place(i + 1, k, left - size,
+                                   room + limit - size):
+                yield partition
+            loads.pop()
+            blocks.pop()
+
+    total = sum(sizes)
+    for k in range(1 if items else 0, len(items) + 1):
+        for partition in place(0, k, total, 0):
+            yield partition
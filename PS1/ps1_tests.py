@@ -0,0 +1,401 @@
+#Test suite for Problem Set 1 (Space Cows)
+
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import ps1a
+import ps1b
+import ps1_benchmark
+from ps1_partition import feasible_partitions, get_partitions
+
+
+def random_herd(n, limit, seed):
+    rng = random.Random(seed)
+    return dict(("cow%d" % i, rng.randint(1, limit)) for i in range(n))
+
+
+def medium_herd(n, limit, seed):
+    rng = random.Random(seed)
+    return dict(("cow%d" % i, rng.randint(limit // 5, limit // 2))
+                for i in range(n))
+
+
+def fewest_trips(cows, limit):
+    return min(len(partition) for partition in get_partitions(list(cows))
+               if all(sum(cows[name] for name in trip) <= limit
+                      for trip in partition))
+
+
+class ps1_partition_feasible(unittest.TestCase):
+
+    def test_only_feasible_partitions(self):
+        weights = random_herd(6, 8, 1)
+        expected = [sorted(sorted(trip) for trip in partition)
+                    for partition in get_partitions(list(weights))
+                    if all(sum(weights[name] for name in trip) <= 8
+                           for trip in partition)]
+        found = [sorted(sorted(trip) for trip in partition)
+                 for partition in feasible_partitions(weights, weights, 8)]
+        self.assertEqual(sorted(found), sorted(expected))
+
+    def test_fewest_blocks_first(self):
+        weights = random_herd(7, 10, 2)
+        sizes = [len(partition)
+                 for partition in feasible_partitions(weights, weights, 10)]
+        self.assertEqual(sizes, sorted(sizes))
+
+    def test_nothing_fits(self):
+        weights = {"Jumbo": 11, "Maggie": 3}
+        self.assertEqual(list(feasible_partitions(weights, weights, 10)), [])
+
+
+class ps1a_load(unittest.TestCase):
+
+    def test_load_cows_int_weights(self):
+        cows = ps1a.load_cows("ps1_cow_data.txt")
+        self.assertEqual(len(cows), 10)
+        self.assertEqual(cows["Moo Moo"], 3)
+        self.assertEqual(cows["Betsy"], 9)
+
+    def test_load_herd(self):
+        herd = ps1a.load_herd("ps1_cow_data_2.txt", index=True)
+        self.assertEqual(len(herd), 8)
+        self.assertEqual(herd.names[0], "Miss Moo-dy")
+        self.assertEqual(herd.weights.tolist(), [3, 4, 10, 2, 9, 5, 3, 6])
+        self.assertEqual(herd.index["Lotus"], 2)
+        self.assertEqual(herd.get_weight("Dottie"), 6)
+
+    def test_transport_from_herd(self):
+        herd = ps1a.load_herd("ps1_cow_data.txt")
+        cows = ps1a.load_cows("ps1_cow_data.txt")
+        self.assertEqual(
+            [sorted(cows[name] for name in trip)
+             for trip in ps1a.greedy_cow_transport(herd)],
+            [sorted(cows[name] for name in trip)
+             for trip in ps1a.greedy_cow_transport(cows)])
+        self.assertEqual(len(ps1a.brute_force_cow_transport(herd)), 5)
+        self.assertEqual(len(ps1a.branch_and_bound_cow_transport(herd)), 5)
+
+
+class ps1a_transport(unittest.TestCase):
+
+    def assertValidTrips(self, trips, cows, limit):
+        names = [name for trip in trips for name in trip]
+        self.assertEqual(sorted(names), sorted(cows))
+        for trip in trips:
+            self.assertTrue(sum(int(cows[name]) for name in trip) <= limit,
+                            "trip {} is over the limit".format(trip))
+
+    def test_branch_and_bound_cow_data(self):
+        cows = ps1a.load_cows("ps1_cow_data.txt")
+        trips = ps1a.branch_and_bound_cow_transport(cows)
+        self.assertValidTrips(trips, cows, 10)
+        self.assertEqual(len(trips), 5)
+
+    def test_branch_and_bound_is_optimal(self):
+        for seed in range(30):
+            cows = random_herd(7, 10, seed)
+            trips = ps1a.branch_and_bound_cow_transport(cows, 10)
+            self.assertValidTrips(trips, cows, 10)
+            self.assertEqual(len(trips), fewest_trips(cows, 10))
+
+    def test_branch_and_bound_large_herd(self):
+        cows = random_herd(200, 100, 0)
+        trips = ps1a.branch_and_bound_cow_transport(cows, 100)
+        self.assertValidTrips(trips, cows, 100)
+        weights = [cows[name] for name in cows]
+        self.assertEqual(len(trips), ps1a.trip_lower_bound(weights, 100))
+
+    def test_branch_and_bound_search_proves_small_herds(self):
+        for seed in range(10):
+            cows = random_herd(7, 10, seed)
+            trips, optimal = ps1a.branch_and_bound_search(cows, 10)
+            self.assertTrue(optimal)
+            self.assertEqual(len(trips), fewest_trips(cows, 10))
+
+    def test_branch_and_bound_medium_herds(self):
+        # 2 to 5 cows a trip; the last herd needs a trip over its lower
+        # bound, which the search has to prove
+        for limit, seed, fewest in ((1000, 1, 18), (1000, 4, 18),
+                                    (100, 1, 18), (100, 3, 19)):
+            cows = medium_herd(50, limit, seed)
+            trips, optimal = ps1a.branch_and_bound_search(cows, limit)
+            self.assertTrue(optimal)
+            self.assertValidTrips(trips, cows, limit)
+            self.assertEqual(len(trips), fewest)
+        self.assertEqual(ps1a.trip_lower_bound(
+            list(medium_herd(50, 100, 3).values()), 100), 18)
+
+    def test_branch_and_bound_node_budget(self):
+        cows = medium_herd(100, 100, 0)
+        trips, optimal = ps1a.branch_and_bound_search(cows, 100,
+                                                      max_nodes=2000)
+        self.assertFalse(optimal)
+        self.assertValidTrips(trips, cows, 100)
+        weights = sorted(((cows[name], name) for name in cows), reverse=True)
+        self.assertTrue(len(trips) >= ps1a.trip_lower_bound(
+            [w for w, _ in weights], 100))
+        self.assertTrue(len(trips) <= len(ps1a.first_fit_decreasing(weights,
+                                                                    100)))
+        self.assertEqual(trips, ps1a.branch_and_bound_cow_transport(
+            cows, 100, max_nodes=2000))
+
+    def test_branch_and_bound_time_budget(self):
+        cows = medium_herd(100, 1000, 0)
+        start = time.time()
+        trips, _ = ps1a.branch_and_bound_search(cows, 1000, time_limit=0.5)
+        self.assertTrue(time.time() - start < 5)
+        self.assertValidTrips(trips, cows, 1000)
+
+    def test_greedy_largest_cow_that_fits(self):
+        cows = {"Maggie": 3, "Herman": 7, "Betsy": 9, "Oreo": 6, "Lola": 2}
+        trips = ps1a.greedy_cow_transport(cows, 10)
+        self.assertEqual(trips, [["Betsy"], ["Herman", "Maggie"],
+                                 ["Oreo", "Lola"]])
+
+    def test_greedy_honors_limit(self):
+        cows = random_herd(500, 20, 3)
+        for limit in (20, 35):
+            trips = ps1a.greedy_cow_transport(cows, limit)
+            self.assertValidTrips(trips, cows, limit)
+        self.assertTrue(len(ps1a.greedy_cow_transport(cows, 35)) <
+                        len(ps1a.greedy_cow_transport(cows, 20)))
+
+    def test_greedy_cow_too_heavy(self):
+        with self.assertRaises(ValueError):
+            ps1a.greedy_cow_transport({"Jumbo": 11}, 10)
+
+    def test_brute_force_is_optimal(self):
+        for seed in range(10):
+            cows = random_herd(7, 10, seed)
+            trips = ps1a.brute_force_cow_transport(cows, 10)
+            self.assertValidTrips(trips, cows, 10)
+            self.assertEqual(len(trips), fewest_trips(cows, 10))
+
+    def test_brute_force_cow_data(self):
+        cows = ps1a.load_cows("ps1_cow_data.txt")
+        trips = ps1a.brute_force_cow_transport(cows)
+        self.assertValidTrips(trips, cows, 10)
+        self.assertEqual(len(trips), 5)
+
+    def test_branch_and_bound_cow_too_heavy(self):
+        with self.assertRaises(ValueError):
+            ps1a.branch_and_bound_cow_transport({"Jumbo": 11}, 10)
+
+    def test_branch_and_bound_empty_herd(self):
+        self.assertEqual(ps1a.branch_and_bound_cow_transport({}), [])
+
+
+class ps1_benchmark_run(unittest.TestCase):
+
+    def test_generate_herd_is_seeded(self):
+        herd = ps1_benchmark.generate_herd(40, 10, "normal", 4)
+        self.assertEqual(herd, ps1_benchmark.generate_herd(40, 10, "normal", 4))
+        self.assertTrue(all(1 <= w <= 10 for w in herd.values()))
+
+    def test_run_benchmarks_rows(self):
+        rows = ps1_benchmark.run_benchmarks([8, 30], repeat=2)
+        self.assertEqual([(row["algorithm"], row["size"]) for row in rows],
+                         [("greedy", 8), ("brute_force", 8),
+                          ("branch_and_bound", 8),
+                          ("greedy", 30), ("branch_and_bound", 30)])
+        for row in rows:
+            self.assertEqual(sorted(row), sorted(ps1_benchmark.FIELDS))
+            self.assertEqual(row["gap"], row["trips"] - row["best_known"])
+            if row["algorithm"] == "branch_and_bound":
+                self.assertEqual(row["gap"], 0)
+                self.assertTrue(row["optimal"])
+            if row["algorithm"] == "brute_force":
+                self.assertTrue(row["optimal"])
+
+    def test_time_limit_flags_unproven_rows(self):
+        herd = ps1_benchmark.generate_herd(100, 100, "medium", 0)
+        self.assertTrue(all(20 <= w <= 50 for w in herd.values()))
+        rows = ps1_benchmark.run_benchmarks([100], 100, "medium", repeat=1,
+                                            time_limit=0.2)
+        self.assertEqual([row["algorithm"] for row in rows],
+                         ["greedy", "branch_and_bound"])
+        for row in rows:
+            self.assertFalse(row["optimal"])
+            self.assertTrue(row["trips"] > row["lower_bound"])
+        self.assertTrue(rows[1]["best_seconds"] < 2)
+
+    def test_peak_memory_filled_in(self):
+        rows = ps1_benchmark.run_benchmarks([8], repeat=1)
+        for row in rows:
+            self.assertTrue(isinstance(row["peak_bytes"], int))
+            self.assertTrue(row["peak_bytes"] >= 0)
+            self.assertTrue(row["memory_method"] in ("tracemalloc",
+                                                     "ru_maxrss"))
+
+    def test_forked_peak_memory_sees_allocations(self):
+        # 8 MB of list per cow on 64-bit builds, half as much on 32-bit ones
+        allocate = lambda cows, limit: len([0] * (len(cows) * 1024 * 1024))
+        cows = dict(("cow%d" % i, 1) for i in range(6))
+        peak = ps1_benchmark.forked_peak_memory(allocate, cows, 10)
+        self.assertTrue(peak >= 12 * 1024 * 1024)
+
+    def test_forked_peak_memory_leaves_out_overhead(self):
+        cows = ps1_benchmark.generate_herd(200, 10, "uniform", 0)
+        self.assertEqual(ps1_benchmark.forked_peak_memory(
+            lambda cows, limit: None, cows, 10), 0)
+        small = ps1_benchmark.forked_peak_memory(
+            ps1a.greedy_cow_transport, cows, 10)
+        large = ps1_benchmark.forked_peak_memory(
+            ps1a.greedy_cow_transport,
+            ps1_benchmark.generate_herd(20000, 10, "uniform", 0), 10)
+        self.assertTrue(small < large)
+
+    def test_write_results(self):
+        rows = ps1_benchmark.run_benchmarks([8], repeat=1)
+        directory = tempfile.mkdtemp()
+        try:
+            ps1_benchmark.write_json(rows, os.path.join(directory, "b.json"))
+            ps1_benchmark.write_csv(rows, os.path.join(directory, "b.csv"))
+            with open(os.path.join(directory, "b.json")) as inFile:
+                self.assertEqual(json.load(inFile), rows)
+            with open(os.path.join(directory, "b.csv")) as inFile:
+                self.assertEqual(len(inFile.readlines()), len(rows) + 1)
+        finally:
+            shutil.rmtree(directory)
+
+
+class ps1b_make_weight(unittest.TestCase):
+
+    def test_dp_make_weight_example(self):
+        eggs, combination = ps1b.dp_make_weight((1, 5, 10, 25), 99)
+        self.assertEqual(eggs, 9)
+        self.assertEqual(combination, [25, 25, 25, 10, 10, 1, 1, 1, 1])
+
+    def test_dp_make_weight_not_greedy(self):
+        eggs, combination = ps1b.dp_make_weight((1, 3, 4), 6)
+        self.assertEqual((eggs, combination), (2, [3, 3]))
+
+    def test_dp_make_weight_large_target(self):
+        eggs, combination = ps1b.dp_make_weight((1, 5, 10, 25), 1000003)
+        self.assertEqual(eggs, 40003)
+        self.assertEqual(sum(combination), 1000003)
+
+    def test_cache_answers_smaller_targets(self):
+        cache = ps1b.EggWeightCache()
+        self.assertEqual(ps1b.dp_make_weight((1, 5, 10, 25), 500, cache)[0], 20)
+        self.assertEqual(ps1b.dp_make_weight((25, 10, 5, 1), 99, cache)[0], 9)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(ps1b.dp_make_weight((1, 5, 10, 25), 1000, cache)[0], 40)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 2, 1))
+
+    def test_negative_target_raises(self):
+        cache = ps1b.EggWeightCache()
+        ps1b.dp_make_weight((1, 5), 1000, cache)
+        with self.assertRaises(ValueError):
+            ps1b.dp_make_weight((1, 5), -1, cache)
+        with self.assertRaises(ValueError):
+            ps1b.make_weight_table((1, 5), -1)
+
+    def test_batch_negative_targets(self):
+        cache = ps1b.EggWeightCache()
+        self.assertEqual(ps1b.dp_make_weights((1, 5), [-3, 4], memo=cache),
+                         [None, 4])
+        self.assertEqual(ps1b.dp_make_weights((1, 5), [-3, -1], True, cache),
+                         ([None, None], [None, None]))
+
+    def test_cache_shared_between_threads(self):
+        table = ps1b.make_weight_table((1, 2), 200)
+        cache = ps1b.EggWeightCache(max_bytes=3 * ps1b.table_bytes(table))
+        errors = []
+
+        def solve(seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(200):
+                    egg = rng.randint(2, 6)
+                    target = rng.randint(0, 200)
+                    eggs = ps1b.dp_make_weight((1, egg), target, cache)[0]
+                    if eggs != target // egg + target % egg:
+                        errors.append((egg, target, eggs))
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=solve, args=(seed,))
+                   for seed in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(cache.nbytes, sum(ps1b.table_bytes(t) for t in
+                                           cache.tables.values()))
+        self.assertTrue(cache.nbytes <= cache.max_bytes)
+
+    def test_cache_evicts_least_recently_used(self):
+        table = ps1b.make_weight_table((1, 2), 99)
+        cache = ps1b.EggWeightCache(max_bytes=2 * ps1b.table_bytes(table))
+        ps1b.dp_make_weight((1, 2), 99, cache)
+        ps1b.dp_make_weight((1, 3), 99, cache)
+        ps1b.dp_make_weight((1, 2), 50, cache)
+        ps1b.dp_make_weight((1, 4), 99, cache)
+        self.assertEqual(list(cache.tables), [(1, 2), (1, 4)])
+        self.assertTrue(cache.nbytes <= cache.max_bytes)
+
+    def test_cache_skips_tables_over_the_cap(self):
+        cache = ps1b.EggWeightCache(max_bytes=1000)
+        self.assertEqual(ps1b.dp_make_weight((1, 5), 1000, cache)[0], 200)
+        self.assertEqual((len(cache), cache.nbytes), (0, 0))
+
+    def test_dp_make_weights_batch(self):
+        cache = ps1b.EggWeightCache()
+        targets = [99, 0, 7, 1000, 30]
+        counts = ps1b.dp_make_weights((1, 5, 10, 25), targets, memo=cache)
+        self.assertEqual(counts, [9, 0, 3, 40, 2])
+        self.assertEqual(counts, [ps1b.dp_make_weight((1, 5, 10, 25), n)[0]
+                                  for n in targets])
+        self.assertEqual(cache.misses, 1)
+
+    def test_dp_make_weights_combinations(self):
+        counts, combinations = ps1b.dp_make_weights((4, 6), [10, 7, 12],
+                                                    combinations=True)
+        self.assertEqual(counts, [2, None, 2])
+        self.assertEqual(combinations, [[6, 4], None, [6, 6]])
+
+    def test_solver_stats(self):
+        cache = ps1b.EggWeightCache()
+        stats = ps1b.SolverStats()
+        ps1b.dp_make_weight((1, 5, 10, 25), 99, cache, stats)
+        self.assertEqual((stats.calls, stats.hits, stats.misses), (1, 0, 1))
+        self.assertEqual((stats.entries, stats.table_size), (99, 100))
+        ps1b.dp_make_weights((1, 5, 10, 25), [10, 20], memo=cache, stats=stats)
+        self.assertEqual((stats.calls, stats.hits, stats.misses), (2, 1, 1))
+        self.assertEqual(stats.entries, 99)
+        self.assertTrue(stats.elapsed > 0)
+
+    def test_stats_hook(self):
+        seen = []
+        ps1b.add_stats_hook(seen.append)
+        try:
+            ps1b.dp_make_weight((1, 3), 40, ps1b.EggWeightCache())
+            with self.assertRaises(ValueError):
+                ps1b.dp_make_weight((3, 5), 4, ps1b.EggWeightCache())
+        finally:
+            ps1b.remove_stats_hook(seen.append)
+        self.assertEqual([(s.calls, s.entries) for s in seen], [(1, 40), (1, 4)])
+        ps1b.dp_make_weight((1, 3), 40)
+        self.assertEqual(len(seen), 2)
+
+    def test_dp_make_weight_unreachable(self):
+        with self.assertRaises(ValueError):
+            ps1b.dp_make_weight((4, 6), 7)
+
+
+if __name__ == "__main__":
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(ps1_partition_feasible))
+    suite.addTest(unittest.makeSuite(ps1a_load))
+    suite.addTest(unittest.makeSuite(ps1a_transport))
+    suite.addTest(unittest.makeSuite(ps1b_make_weight))
+    suite.addTest(unittest.makeSuite(ps1_benchmark_run))
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -1,82 +1,424 @@
-from ps1_partition import get_partitions
+from ps1_partition import feasible_partitions
 import time
-import numpy as np
+import bisect
+import array
+try:
+    import numpy as np
+except ImportError:
+    np=None
+
+class Herd(object):
+    """A cow manifest kept as parallel arrays: names[i] weighs weights[i]
+    (an array('i'), or a NumPy array). index maps each name to its position,
+    or is None when the herd was loaded without one."""
+    def __init__(self, names, weights, index=None):
+        self.names=names
+        self.weights=weights
+        self.index=index
+
+    def __len__(self):
+        return len(self.names)
+
+    def get_weight(self, name):
+        if(self.index is None): return self.weights[self.names.index(name)]
+        return self.weights[self.index[name]]
+
+def load_herd(filename,index=False,use_numpy=False):
+    """
+    Reads a manifest of comma-separated cow name, weight lines one line at a
+    time, converting each weight to an int once.
+
+    Parameters:
+    filename - the name of the data file as a string
+    index - whether to build the name -> position map (a bool)
+    use_numpy - whether to hand the weights back as a NumPy array (a bool)
+
+    Returns:
+    a Herd
+    """
+    if(use_numpy and np is None): raise ImportError("numpy is not installed")
+    names=[]
+    weights=array.array('i')
+    with open(filename,'r') as inFile:
+        for line in inFile:
+            line=line.strip()
+            if(not line): continue
+            name,weight=line.rsplit(",",1)
+            names.append(name)
+            weights.append(int(weight))
+    positions=None
+    if(index): positions=dict((name,i) for i,name in enumerate(names))
+    if(use_numpy): weights=np.frombuffer(weights,dtype=np.intc)
+    return Herd(names,weights,positions)
 
 def load_cows(filename):
- inFile = open(filename, 'r')
- wordlist = {}
- for line in inFile:
-   line=line.rstrip()
-   tmp=line.split(",")
-   wordlist[tmp[0]]=tmp[1]
- #print len(wordlist), "words loaded."
- return wordlist
+    """
+    Read the contents of the given file. Assumes the file contents contain
+    data in the form of comma-separated cow name, weight pairs, and return a
+    dictionary containing cow names as keys and corresponding weights as values.
+
+    Parameters:
+    filename - the name of the data file as a string
+
+    Returns:
+    a dictionary of cow name (string), weight (int) pairs
+    """
+    herd=load_herd(filename)
+    return dict(zip(herd.names,herd.weights))
+
+def cow_weights(cows):
+    """
+    Returns the cows as parallel lists of names and int weights, reading a
+    Herd's arrays in bulk.
+
+    Parameters:
+    cows - a dictionary of name (string), weight (int) pairs, or a Herd
+    """
+    if(isinstance(cows,Herd)): return list(cows.names),cows.weights.tolist()
+    names=list(cows.keys())
+    return names,[int(cows[name]) for name in names]
 
 def greedy_cow_transport(cows,limit=10):
- def maximum_weight(cows): 
-    maxW=max(C.values())
-    for key in C.keys():
-     if(C[key]==maxW): 
-      maxKey=key 
-      break
-    return (int(maxW), maxKey)
-
- #taking a trip
- C=cows.copy()
- C2=cows.copy()
- trip=[]
- while (len(C2)!=0):
-  taken=[]
-  actual_w=0
-  while(True):
-   if(actual_w>limit or len(C)==0): break
-   maxW,maxKey=maximum_weight(C)
-   if(actual_w+maxW<=10): 
-    actual_w+=maxW
-    taken.append(maxKey)
-   del C[maxKey]
-  for take in taken:
-    del C2[take]
-  trip.append(taken)
-  C=C2.copy() 
- return trip 
+    """
+    Uses a greedy heuristic to determine an allocation of cows that attempts to
+    minimize the number of spaceship trips needed: as long as the current trip
+    can fit another cow, the largest cow that will fit is added to it, and once
+    the trip is full a new trip is started for the remaining cows.
+
+    The cows are sorted by weight once; the largest cow that fits is found by
+    bisecting on the room left, and cows already loaded are skipped through a
+    union-find that links each of them to the next lighter cow, so the whole
+    allocation takes O(n log n).
+
+    Does not mutate the given dictionary of cows.
+
+    Parameters:
+    cows - a dictionary of name (string), weight (int) pairs, or a Herd
+    limit - weight limit of the spaceship (an int)
+
+    Returns:
+    A list of lists, with each inner list containing the names of cows
+    transported on a particular trip and the overall list containing all the
+    trips
+    """
+    # lightest to heaviest; among equal weights the cow listed first in cows
+    # comes last so it is the one loaded first
+    names,weights=cow_weights(cows)
+    herd=sorted(reversed(list(zip(names,weights))),key=lambda cow:cow[1])
+    weights=[w for _,w in herd]
+    if(weights and weights[-1]>limit): raise ValueError("cow heavier than the limit")
+
+    # below[i]==i while cow i is waiting, otherwise it leads to a lighter cow
+    below=list(range(len(herd)))
+    def heaviest_waiting(i):
+        root=i
+        while(root>=0 and below[root]!=root): root=below[root]
+        while(i>=0 and below[i]!=i): below[i],i=root,below[i]
+        return root
+
+    trips=[]
+    waiting=len(herd)
+    while(waiting):
+        trip=[]
+        room=limit
+        while(True):
+            i=heaviest_waiting(bisect.bisect_right(weights,room)-1)
+            if(i<0): break
+            trip.append(herd[i][0])
+            room-=weights[i]
+            below[i]=i-1
+            waiting-=1
+        trips.append(trip)
+    return trips
 
 def brute_force_cow_transport(cows,limit=10):
-  l=[]
-  #building a set using the keys
-  S=[]
-  for c in cows.keys():
-   S.append(c)
-  S=set(S)
-
-  for partition in get_partitions(cows.keys()):
-   #print(partition)
-   l.append(partition)
- 
-  def weight_calculator(L):
-   w=0
-   for e in L:
-     w+=int(cows[e])  
-   return w
-  
-  def delete_elements(ll,S):
-   for elem in ll:
-    S2=set(elem)
-    S=S.difference(S2) 
-   return S
-
-  trip=[]
-  for elem in l:
-   Flag=0
-   for i in range(len(elem)):
-    if(weight_calculator(elem[i])<=10): 
-     Flag+=1
-   if(Flag==len(elem)):
-    trip.append(elem)
-    S=delete_elements(elem,S)
-   if(len(S)==0): break
-     
-  return trip[0]
+    """
+    Finds the allocation of cows that minimizes the number of spaceship trips
+    via brute force. Partitions of the herd come from feasible_partitions,
+    which never builds a trip over the limit and yields the allocations with
+    the fewest trips first, so the first one is optimal.
+
+    Does not mutate the given dictionary of cows.
+
+    Parameters:
+    cows - a dictionary of name (string), weight (int) pairs, or a Herd
+    limit - weight limit of the spaceship (an int)
+
+    Returns:
+    A list of lists, with each inner list containing the names of cows
+    transported on a particular trip and the overall list containing all the
+    trips
+    """
+    names,weights=cow_weights(cows)
+    for partition in feasible_partitions(range(len(names)),weights,limit):
+        return [[names[i] for i in trip] for trip in partition]
+    raise ValueError("cow heavier than the limit")
+
+def first_fit_decreasing(weights,limit=10):
+    """
+    Packs items into trips using the first-fit-decreasing heuristic.
+
+    Parameters:
+    weights - a list of (weight (int), name (string)) pairs sorted from
+        heaviest to lightest
+    limit - weight limit of the spaceship (an int)
+
+    Returns:
+    A list of trips, each trip being a list of [remaining capacity, names]
+    """
+    trips=[]
+    for w,name in weights:
+        for trip in trips:
+            if(trip[0]>=w):
+                trip[0]-=w
+                trip[1].append(name)
+                break
+        else:
+            trips.append([limit-w,[name]])
+    return trips
+
+def trip_lower_bound(weights,limit=10):
+    """
+    Martello-Toth lower bound on the number of trips needed to carry the
+    given weights. For every threshold a <= limit/2 the weights above
+    limit-a need a trip each, the ones above limit/2 need a trip each as
+    well, and the weights between a and limit/2 fill whatever those trips
+    leave free before asking for new ones.
+
+    Parameters:
+    weights - a list of weights (int)
+    limit - weight limit of the spaceship (an int)
+
+    Returns:
+    int, a number of trips no allocation can go below
+    """
+    weights=sorted(weights)
+    # prefix[k] is the weight of the k lightest items
+    prefix=[0]
+    for w in weights:
+        prefix.append(prefix[-1]+w)
+    n=len(weights)
+    half=bisect.bisect_right(weights,limit//2)
+    best=-(-prefix[n]//limit)
+    for a in set([0]+weights[:half]):
+        top=bisect.bisect_right(weights,limit-a)
+        medium=top-half
+        free=medium*limit-(prefix[top]-prefix[half])
+        small=prefix[half]-prefix[bisect.bisect_left(weights,a)]
+        best=max(best,n-half+max(0,-(-(small-free)//limit)))
+    return best
+
+def fix_dominant_trips(weights,limit=10):
+    """
+    Martello-Toth reduction: takes out the trips that some optimal
+    allocation is known to contain. A cow heavier than half the limit goes
+    alone when nothing else fits with it, and goes with the heaviest cow
+    that fits next to it when no group of lighter cows fitting in the same
+    space weighs more than that single cow (checked with subset-sum bitsets
+    over the free space).
+
+    Parameters:
+    weights - a list of (weight (int), name (string)) pairs sorted from
+        heaviest to lightest
+    limit - weight limit of the spaceship (an int)
+
+    Returns:
+    A tuple (trips, rest) with the fixed trips as lists of names and the
+    remaining (weight, name) pairs, still sorted from heaviest to lightest
+    """
+    rest=list(weights)
+    trips=[]
+    sums=None
+    i=0
+    while(i<len(rest) and 2*rest[i][0]>limit):
+        if(sums is None):
+            # bit s of sums[k] is set when some of rest[k:] weigh s together
+            keys=[-w for w,_ in rest]
+            sums=[1]*(len(rest)+1)
+            for k in range(len(rest)-1,-1,-1):
+                sums[k]=(sums[k+1]|(sums[k+1]<<rest[k][0]))&((2<<limit)-1)
+        w,name=rest[i]
+        space=limit-w
+        j=bisect.bisect_left(keys,-space)
+        if(j==len(rest)):
+            trips.append([name])
+            rest.pop(i)
+            sums=None
+        elif(rest[j][0]==space or
+             (sums[j]&((2<<space)-1))>>(rest[j][0]+1)==0):
+            trips.append([name,rest[j][1]])
+            rest.pop(j)
+            rest.pop(i)
+            sums=None
+        else:
+            i+=1
+    return trips,rest
+
+def trip_completions(weights,space,slack):
+    """
+    Lists the ways of filling a trip that has the given space left with some
+    of the given weights, leaving at most slack of it empty. Only maximal
+    fillings are kept, and a filling is dropped when swapping one of its
+    weights for a heavier one left out would still fit, since that filling
+    can never lead to fewer trips. Equal weights are treated as one group so
+    each distinct filling is listed once.
+
+    Parameters:
+    weights - a list of weights (int) sorted from heaviest to lightest
+    space - the room left in the trip (an int)
+    slack - the most room the trip may be left with (an int)
+
+    Returns:
+    A list of (room left, indices of the weights taken) pairs, emptiest
+    trips last
+    """
+    n=len(weights)
+    # bit s of sums[k] is set when some of weights[k:] weigh s together
+    sums=[1]*(n+1)
+    for k in range(n-1,-1,-1):
+        sums[k]=(sums[k+1]|(sums[k+1]<<weights[k]))&((2<<space)-1)
+    found=[]
+    taken=[]
+    left=[]
+
+    def dominated(room):
+        for y in left:
+            if(y<=room): return True
+            for j in taken:
+                if(weights[j]<y<=weights[j]+room): return True
+        return False
+
+    def fill(k,room):
+        if(room-((sums[k]&((2<<room)-1)).bit_length()-1)>slack): return
+        # weights that no longer fit are left out without branching
+        skipped=len(left)
+        while(k<n and weights[k]>room):
+            if(left[-1:]!=[weights[k]]): left.append(weights[k])
+            k+=1
+        if(k==n):
+            if(not dominated(room)): found.append((room,list(taken)))
+        else:
+            w=weights[k]
+            end=k
+            while(end<n and weights[end]==w): end+=1
+            for m in range(min(end-k,room//w),-1,-1):
+                taken.extend(range(k,k+m))
+                if(m<end-k): left.append(w)
+                fill(end,room-m*w)
+                if(m<end-k): left.pop()
+                del taken[len(taken)-m:]
+        del left[skipped:]
+
+    fill(0,space)
+    found.sort(key=lambda f:f[0])
+    return found
+
+def branch_and_bound_search(cows,limit=10,max_nodes=None,time_limit=None):
+    """
+    Searches for the allocation of cows that minimizes the number of
+    spaceship trips using an exact branch-and-bound bin-packing search,
+    stopping early once a node or time budget is spent.
+
+    The first-fit-decreasing allocation is the initial upper bound and the
+    search stops as soon as it meets trip_lower_bound. Trips are filled one
+    at a time, each starting with the heaviest cow left and trying its
+    trip_completions from the fullest down; fix_dominant_trips is applied
+    to the cows left at every step. A branch is cut when the cows left can
+    not fit in the trips still allowed, and herds that were already shown
+    not to fit in as many trips are remembered and skipped.
+
+    Does not mutate the given dictionary of cows.
+
+    Parameters:
+    cows - a dictionary of name (string), weight (int) pairs, or a Herd
+    limit - weight limit of the spaceship (an int)
+    max_nodes - most search nodes to expand (an int), None for no limit
+    time_limit - most seconds to search (a number), None for no limit
+
+    Returns:
+    A tuple (trips, optimal): the best allocation found, as a list of trips
+    each listing the names of the cows it carries, and whether it is proven
+    to use the fewest trips possible (False when the budget ran out first)
+    """
+    names,weights=cow_weights(cows)
+    weights=sorted(zip(weights,names),reverse=True)
+    if(not weights): return [],True
+    if(weights[0][0]>limit): raise ValueError("cow heavier than the limit")
+
+    lower=trip_lower_bound([w for w,_ in weights],limit)
+    best=[[trip[1] for trip in first_fit_decreasing(weights,limit)]]
+    if(len(best[0])==lower): return best[0],True
+    deadline=None if time_limit is None else time.time()+time_limit
+    trips=[]
+    # herd (as a tuple of weights) -> most trips it was shown not to fit in
+    failed={}
+    # nodes expanded so far, and whether the budget stopped the search
+    nodes=[0]
+    stopped=[False]
+
+    def search(rest):
+        fixed,rest=fix_dominant_trips(rest,limit)
+        trips.extend(fixed)
+        done=fill_trip(rest)
+        del trips[len(trips)-len(fixed):]
+        return done
+
+    def fill_trip(rest):
+        if(not rest):
+            best[0]=[list(trip) for trip in trips]
+            return len(best[0])==lower
+        nodes[0]+=1
+        if((max_nodes is not None and nodes[0]>max_nodes) or
+           (deadline is not None and time.time()>deadline)):
+            stopped[0]=True
+            return True
+        herd=tuple(w for w,_ in rest)
+        allowed=len(best[0])-1-len(trips)
+        if(failed.get(herd,-1)>=allowed): return False
+        if(trip_lower_bound(herd,limit)>allowed): return False
+        w,name=rest[0]
+        others=rest[1:]
+        slack=allowed*limit-sum(herd)
+        for room,taken in trip_completions(herd[1:],limit-w,slack):
+            if(room>(len(best[0])-1-len(trips))*limit-sum(herd)): break
+            trips.append([name]+[others[k][1] for k in taken])
+            taken=set(taken)
+            done=search([cow for k,cow in enumerate(others) if k not in taken])
+            trips.pop()
+            if(done): return True
+        # every branch was searched against a bound no tighter than the
+        # current one, so the herd does not fit in the trips allowed now
+        allowed=len(best[0])-1-len(trips)
+        failed[herd]=max(failed.get(herd,-1),allowed)
+        return False
+
+    search(weights)
+    return best[0],not stopped[0]
+
+def branch_and_bound_cow_transport(cows,limit=10,max_nodes=None,
+                                   time_limit=5):
+    """
+    Finds the allocation of cows that minimizes the number of spaceship trips
+    with branch_and_bound_search. The search gives up after time_limit
+    seconds (or max_nodes nodes) and returns the best allocation found by
+    then, which may not be optimal; use branch_and_bound_search to learn
+    whether it is, or pass time_limit=None to always search to the end.
+
+    Does not mutate the given dictionary of cows.
+
+    Parameters:
+    cows - a dictionary of name (string), weight (int) pairs, or a Herd
+    limit - weight limit of the spaceship (an int)
+    max_nodes - most search nodes to expand (an int), None for no limit
+    time_limit - most seconds to search (a number), None for no limit,
+        5 by default
+
+    Returns:
+    A list of lists, with each inner list containing the names of cows
+    transported on a particular trip and the overall list containing all the
+    trips
+    """
+    return branch_and_bound_search(cows,limit,max_nodes,time_limit)[0]
 
 def compare_cow_transport_algorithms():
   cows=load_cows("ps1_cow_data.txt")
@@ -89,10 +431,16 @@ def compare_cow_transport_algorithms():
   trip2=brute_force_cow_transport(cows)
   end=time.time()
   print "time using brute force:", end-start
-  print "trips:", trip2, "number of trips:", len(trip2)
+  print "trips:", trip2, "number of trips:", len(trip2),"\n"
+  start=time.time()
+  trip3=branch_and_bound_cow_transport(cows)
+  end=time.time()
+  print "time using branch and bound:", end-start
+  print "trips:", trip3, "number of trips:", len(trip3)
   
 
-compare_cow_transport_algorithms()
+if __name__ == "__main__":
+  compare_cow_transport_algorithms()
 
 
 
@@ -1,76 +1,221 @@
-global count
-count=0
-
-def calculateCost(L):
- cost=len(L)
- value=0
- for e in L:
-  value+=e
- return (cost,value)
-
-
-def dp_make_weight(egg_weights, target_weight,memo={}):
- toConsider=[]
- def backpack(toConsider,avail,limit):
-  global count
-  count+=1
-  if(tuple(toConsider) in memo): return memo[tuple(toConsider)] 
-  if(len(avail)==0):
-   cost,value=calculateCost(toConsider)
-   maxItem=(cost,value,toConsider)
-   return maxItem
-  else:
-   next=toConsider+[avail[0]]
-   remaining=avail[1:]
-   withVal=backpack(next,remaining,limit)
-   withoutVal=backpack(toConsider,remaining,limit)
-   if(withVal[1]>withoutVal[1] and withVal[1]<=limit): 
-    t=tuple(withVal[2])
-    memo[t]=withVal
-    return withVal
-   elif(withVal[1]<withoutVal[1] and withoutVal[1]<=limit): 
-    t=tuple(withoutVal[2])
-    memo[t]=withoutVal
-    return withoutVal
-   else: 
-    if(withVal[1]<=limit): return withVal
-    else: return withoutVal
-   
- return backpack(toConsider,egg_weights,target_weight)
-
-
-def build_list(L,n):
- L2=L
- F=[]
- m=max(L)
- N=n//m
- Lp=[m]*N
- F.extend(Lp)
- for i in range(1,len(L)):
-  m=max(L[i:])
-  if(i<=2): Lp=[m]*1*N
-  else: Lp=[m]*2*N
-  F.extend(Lp)
- return F
-
-egg_weights=[20,10,5,1]
-n=99
-L=build_list(egg_weights,n)
-
-result=dp_make_weight(L,n)
-print "best combination:", result[2]
-print "number of callings using DP:", count
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+import array
+import collections
+import contextlib
+import threading
+try:
+    from time import perf_counter
+except ImportError:
+    from timeit import default_timer as perf_counter
+
+# stored in the egg table for weights no combination of eggs makes
+UNREACHABLE=2**31-1
+
+class SolverStats(object):
+    """Work done by the egg solvers. Pass one to dp_make_weight or
+    dp_make_weights (the same object can collect several calls) or register
+    a hook with add_stats_hook to get one per call."""
+    def __init__(self):
+        self.calls=0
+        self.hits=0
+        self.misses=0
+        self.entries=0
+        self.table_size=0
+        self.elapsed=0.0
+
+    def __repr__(self):
+        return ("SolverStats(calls={}, hits={}, misses={}, entries={}, "
+                "table_size={}, elapsed={:.6f})").format(
+                    self.calls,self.hits,self.misses,self.entries,
+                    self.table_size,self.elapsed)
+
+# callables given the SolverStats of every solver call
+stats_hooks=[]
+
+def add_stats_hook(hook):
+    stats_hooks.append(hook)
+
+def remove_stats_hook(hook):
+    stats_hooks.remove(hook)
+
+def make_weight_table(egg_weights, target_weight, table=None, stats=None):
+    """
+    Bottom-up unbounded coin-change table over every weight 0..target_weight.
+
+    Parameters:
+    egg_weights - tuple of integers, available egg weights
+    target_weight - int, largest weight the table has to cover
+    table - OPTIONAL (eggs, last) table for the same egg weights covering a
+        smaller range, which is extended in place instead of starting over
+    stats - SolverStats, OPTIONAL, counts the table entries computed
+
+    Returns:
+    A tuple (eggs, last) of flat arrays: eggs[w] is the smallest number of
+    eggs weighing exactly w (UNREACHABLE when no combination does) and
+    last[w] is the weight of one egg of such a combination. Raises a
+    ValueError for a negative target_weight.
+    """
+    weights=sorted(set(egg_weights))
+    if(not weights or weights[0]<=0): raise ValueError("egg weights must be positive")
+    if(target_weight<0): raise ValueError("target weight must not be negative")
+    if(table is None): table=(array.array('l',[0]),array.array('l',[0]))
+    eggs,last=table
+    start=len(eggs)
+    if(target_weight<start): return eggs,last
+    eggs.extend(array.array('l',[UNREACHABLE])*(target_weight+1-start))
+    last.extend(array.array('l',[0])*(target_weight+1-start))
+    for w in range(start,target_weight+1):
+        best=UNREACHABLE
+        for egg in weights:
+            if(egg>w): break
+            if(eggs[w-egg]+1<best):
+                best=eggs[w-egg]+1
+                last[w]=egg
+        eggs[w]=best
+    if(stats is not None): stats.entries+=target_weight+1-start
+    return eggs,last
+
+def table_bytes(table):
+    return sum(len(a)*a.itemsize for a in table)
+
+class EggWeightCache(object):
+    """LRU cache of egg tables, one per set of egg weights, holding at most
+    max_bytes of tables. A table built for a target answers every smaller
+    target of the same egg weights, and is extended in place for larger
+    ones. get_table may be called from several threads at once."""
+    def __init__(self, max_bytes=64*1024*1024):
+        self.max_bytes=max_bytes
+        self.lock=threading.Lock()
+        self.tables=collections.OrderedDict()
+        self.nbytes=0
+        self.hits=0
+        self.misses=0
+
+    def __len__(self):
+        return len(self.tables)
+
+    def clear(self):
+        with self.lock:
+            self.tables.clear()
+            self.nbytes=0
+
+    def get_table(self, egg_weights, target_weight, stats=None):
+        """Returns the (eggs, last) table of egg_weights covering at least
+        target_weight, building or extending it when needed. Hits, misses
+        and entries computed are also added to stats when given. Raises a
+        ValueError for a negative target_weight."""
+        if(target_weight<0): raise ValueError("target weight must not be negative")
+        key=tuple(sorted(set(egg_weights)))
+        with self.lock:
+            table=self.tables.pop(key,None)
+            if(table is not None and target_weight<len(table[0])):
+                self.hits+=1
+                if(stats is not None): stats.hits+=1
+                self.tables[key]=table
+                return table
+            self.misses+=1
+            if(stats is not None): stats.misses+=1
+            if(table is not None): self.nbytes-=table_bytes(table)
+            table=make_weight_table(key,target_weight,table,stats)
+            size=table_bytes(table)
+            if(size>self.max_bytes): return table
+            while(self.nbytes+size>self.max_bytes):
+                self.nbytes-=table_bytes(self.tables.popitem(last=False)[1])
+            self.tables[key]=table
+            self.nbytes+=size
+            return table
+
+# shared by every dp_make_weight call that is not given its own cache
+egg_cache=EggWeightCache()
+
+def dp_make_weight(egg_weights, target_weight, memo=None, stats=None):
+    """
+    Find number of eggs to bring back, using the smallest number of eggs. Assumes there is
+    an infinite supply of eggs of each weight.
+
+    The answer is read from the egg table of make_weight_table, built
+    bottom-up in O(n*k) time and O(n) memory for a target n and k egg
+    weights. Tables are kept in an EggWeightCache, so once a target has been
+    answered every smaller target of the same egg weights is a lookup.
+
+    Parameters:
+    egg_weights - tuple of integers, available egg weights
+    target_weight - int, amount of weight we want to find eggs to fit
+    memo - EggWeightCache, OPTIONAL cache of egg tables (egg_cache by default)
+    stats - SolverStats, OPTIONAL, collects the work done by this call
+
+    Returns: a tuple (smallest number of eggs needed to make target weight,
+    list of the egg weights taken from heaviest to lightest). Raises a
+    ValueError if no combination of eggs weighs exactly target_weight.
+    """
+    with solver_stats(stats) as stats:
+        if(memo is None): memo=egg_cache
+        eggs,last=memo.get_table(egg_weights,target_weight,stats)
+        if(stats is not None): stats.table_size=len(eggs)
+        if(eggs[target_weight]==UNREACHABLE): raise ValueError("target weight cannot be made")
+        return eggs[target_weight],egg_combination(last,target_weight)
+
+def dp_make_weights(egg_weights, target_weights, combinations=False, memo=None,
+                    stats=None):
+    """
+    Batch version of dp_make_weight: the egg table is looked up (or built)
+    once up to the largest target and every target is then read from it.
+
+    Parameters:
+    egg_weights - tuple of integers, available egg weights
+    target_weights - sequence of ints, the weights to answer
+    combinations - bool, whether to also return the egg combinations
+    memo - EggWeightCache, OPTIONAL cache of egg tables (egg_cache by default)
+    stats - SolverStats, OPTIONAL, collects the work done by this call
+
+    Returns: a list with the smallest number of eggs for each target, None
+    for targets no combination of eggs makes (including negative ones). With combinations=True, a
+    tuple of that list and the list of combinations (None when unreachable).
+    """
+    with solver_stats(stats) as stats:
+        if(memo is None): memo=egg_cache
+        if(len(target_weights)==0): return ([],[]) if combinations else []
+        eggs,last=memo.get_table(egg_weights,max(0,max(target_weights)),stats)
+        if(stats is not None): stats.table_size=len(eggs)
+        # negative targets are as unreachable as the UNREACHABLE entries
+        made=[w>=0 and eggs[w]!=UNREACHABLE for w in target_weights]
+        counts=[eggs[w] if ok else None for w,ok in zip(target_weights,made)]
+        if(not combinations): return counts
+        return counts,[egg_combination(last,w) if ok else None
+                       for w,ok in zip(target_weights,made)]
+
+@contextlib.contextmanager
+def solver_stats(stats):
+    """Times one solver call into stats (a fresh SolverStats when hooks are
+    registered and none was given) and hands it to the stats hooks."""
+    if(stats is None and stats_hooks): stats=SolverStats()
+    if(stats is None):
+        yield None
+        return
+    start=perf_counter()
+    try:
+        yield stats
+    finally:
+        stats.calls+=1
+        stats.elapsed+=perf_counter()-start
+        for hook in list(stats_hooks):
+            hook(stats)
+
+def egg_combination(last, target_weight):
+    """Walks the last-egg array of an egg table back from target_weight and
+    returns the eggs taken, heaviest first."""
+    combination=[]
+    w=target_weight
+    while(w>0):
+        combination.append(last[w])
+        w-=last[w]
+    return sorted(combination,reverse=True)
+
+if __name__ == '__main__':
+    egg_weights=(1,5,10,20)
+    n=99
+    stats=SolverStats()
+    result=dp_make_weight(egg_weights,n,stats=stats)
+    print "number of eggs:", result[0]
+    print "best combination:", result[1]
+    print "number of table entries using DP:", stats.entries
+    print "eggs for 1..10:", dp_make_weights(egg_weights,range(1,11))
@@ -0,0 +1,199 @@
+# 6.0002 Problem Set 2
+# Graph optimization
+#
+# All-pairs shortest paths, precomputed once and stored in a file that
+# queries read through mmap, e.g.
+#
+#   precompute(load_map("mit_map.txt"), "mit_map.apsp")
+#   with PathTable("mit_map.apsp") as table:
+#       table.path('32', '56')
+#
+# File layout (native byte order): a header (magic, version, n, length of
+# the name table), the building names separated by newlines padded to 8
+# bytes, then the n x n float64 distance matrix and the n x n int32
+# predecessor matrix, both row-major. pred[i][j] is the building before j
+# on the shortest path from i, -1 if there is none.
+
+import mmap
+import multiprocessing
+import struct
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from routing import INFINITY, dijkstra
+
+MAGIC = b"APSP"
+VERSION = 1
+HEADER = struct.Struct("=4sIII")
+# largest map solved by Floyd-Warshall when numpy is available
+FLOYD_LIMIT = 2000
+
+
+def floyd_warshall(adjacency):
+    """
+    Floyd-Warshall on numpy matrices, O(n^3) time and O(n^2) memory.
+
+    Returns:
+        A tuple (dist, pred) of n x n float64 and int32 arrays
+    """
+    if np is None:
+        raise ImportError("numpy is not installed")
+    n = len(adjacency)
+    dist = np.full((n, n), INFINITY)
+    pred = np.full((n, n), -1, dtype=np.int32)
+    for u in range(n):
+        for v, total, _ in adjacency.neighbors(u):
+            if total < dist[u, v]:
+                dist[u, v] = total
+                pred[u, v] = u
+    np.fill_diagonal(dist, 0.0)
+    np.fill_diagonal(pred, -1)
+    for k in range(n):
+        via = dist[:, k, None] + dist[None, k, :]
+        better = via < dist
+        dist[better] = via[better]
+        pred[better] = np.broadcast_to(pred[k], (n, n))[better]
+    return dist, pred
+
+
+_digraph = None
+
+
+def _init_worker(digraph):
+    global _digraph
+    _digraph = digraph
+
+
+def _dijkstra_row(name):
+    dist, pred = dijkstra(_digraph, name)
+    return array('d', dist), array('i', pred)
+
+
+def dijkstra_rows(digraph, processes=None):
+    """
+    Yields the (dist, pred) rows of every building in CompactAdjacency
+    order, running one Dijkstra per building in a pool of processes (all
+    CPUs if processes is None, in this process if it is 1).
+    """
+    names = [node.get_name() for node in digraph.get_adjacency().nodes]
+    if processes == 1:
+        _init_worker(digraph)
+        for name in names:
+            yield _dijkstra_row(name)
+        return
+    pool = multiprocessing.Pool(processes, _init_worker, (digraph,))
+    try:
+        chunk = max(1, len(names) // (4 * (processes or
+                                            multiprocessing.cpu_count())))
+        for row in pool.imap(_dijkstra_row, names, chunk):
+            yield row
+    finally:
+        pool.close()
+        pool.join()
+
+
+def precompute(digraph, filename, method=None, processes=None):
+    """
+    Solves all-pairs shortest paths on digraph and writes them to filename.
+
+    Parameters:
+        digraph: Digraph instance
+        filename: string
+        method: "floyd", "dijkstra" or None to use Floyd-Warshall when
+            numpy is installed and the map has at most FLOYD_LIMIT buildings
+        processes: number of worker processes for the Dijkstra method
+
+    Returns:
+        The number of buildings written
+    """
+    adjacency = digraph.get_adjacency()
+    n = len(adjacency)
+    if method is None:
+        method = "floyd" if np is not None and n <= FLOYD_LIMIT \
+            else "dijkstra"
+    names = "\n".join(node.get_name() for node in adjacency.nodes)
+    names = names.encode("utf-8")
+    padding = -(HEADER.size + len(names)) % 8
+    with open(filename, "wb") as outFile:
+        outFile.write(HEADER.pack(MAGIC, VERSION, n, len(names)))
+        outFile.write(names + b"\0" * padding)
+        start = outFile.tell()
+        if method == "floyd":
+            dist, pred = floyd_warshall(adjacency)
+            dist.tofile(outFile)
+            pred.tofile(outFile)
+        elif method == "dijkstra":
+            for i, (dist, pred) in enumerate(dijkstra_rows(digraph,
+                                                           processes)):
+                outFile.seek(start + 8 * n * i)
+                dist.tofile(outFile)
+                outFile.seek(start + 8 * n * n + 4 * n * i)
+                pred.tofile(outFile)
+        else:
+            raise ValueError("unknown method " + str(method))
+    return n
+
+
+class PathTable(object):
+    """Read-only view of a file written by precompute. Lookups read the
+    mapped file directly, so opening it costs only the name table."""
+    def __init__(self, filename):
+        self.file = open(filename, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0,
+                              access=mmap.ACCESS_READ)
+        magic, version, n, length = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(filename + " is not a path table")
+        names = self.data[HEADER.size:HEADER.size + length]
+        if bytes is not str:
+            names = names.decode("utf-8")
+        self.names = names.split("\n") if n else []
+        self.ids = dict((name, i) for i, name in enumerate(self.names))
+        self.dist_offset = HEADER.size + length + \
+            (-(HEADER.size + length) % 8)
+        self.pred_offset = self.dist_offset + 8 * n * n
+
+    def __len__(self):
+        return len(self.names)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def node_id(self, name):
+        i = self.ids.get(name)
+        if i is None:
+            raise ValueError("Node not in graph")
+        return i
+
+    def distance(self, start, end):
+        """Shortest total distance from start to end, INFINITY if end cannot
+        be reached."""
+        i, j = self.node_id(start), self.node_id(end)
+        return struct.unpack_from("=d", self.data, self.dist_offset +
+                                  8 * (len(self.names) * i + j))[0]
+
+    def path(self, start, end):
+        """Shortest path from start to end as a list of building numbers,
+        raising a ValueError if there is none."""
+        i, j = self.node_id(start), self.node_id(end)
+        n = len(self.names)
+        if self.distance(start, end) == INFINITY:
+            raise ValueError("No path satisfies the constraints")
+        path = [j]
+        while j != i:
+            j = struct.unpack_from("=i", self.data, self.pred_offset +
+                                   4 * (n * i + j))[0]
+            path.append(j)
+        return [self.names[k] for k in reversed(path)]
@@ -0,0 +1,132 @@
+# 6.0002 Problem Set 2
+# Graph optimization
+#
+# Batch route queries over one read-only map, e.g.
+#
+#   route_batch(load_map("mit_map.txt"),
+#               [('32', '56'), ('1', '32', None, 0), ('32', '13')])
+#
+# Identical queries are answered once and queries are grouped by start
+# building: one shortest-path tree per start answers every query of the
+# group it satisfies, and only queries whose outdoor limit rules out the
+# tree's route need their own constrained search. Groups are spread over a
+# pool of processes.
+
+import multiprocessing
+
+from graph import Digraph
+from routing import INFINITY, node_id, shortest_path, shortest_path_tree, \
+    tree_path
+
+_digraph = None
+
+
+def _init_worker(digraph, snapshot):
+    global _digraph
+    _digraph = Digraph.load_snapshot(snapshot) if snapshot else digraph
+
+
+def normalize_query(query):
+    """Returns a (start, end, max_total_dist, max_dist_outdoors) tuple for
+    a query given with or without its limits."""
+    query = tuple(query)
+    if len(query) not in (2, 3, 4):
+        raise ValueError("bad query " + str(query))
+    return query + (None,) * (4 - len(query))
+
+
+def route_group(digraph, start, queries):
+    """
+    Answers queries that all leave from start.
+
+    Parameters:
+        digraph: Digraph instance
+        start: string
+        queries: list of (end, max_total_dist, max_dist_outdoors) tuples
+
+    Returns:
+        A list with the (path, total distance, outdoor distance) of each
+        query, or None where no route satisfies it
+    """
+    adjacency = digraph.get_adjacency()
+    try:
+        node_id(adjacency, start)
+    except ValueError:
+        return [None] * len(queries)
+    dist, outside, pred = shortest_path_tree(digraph, start)
+    results = []
+    for end, max_total_dist, max_dist_outdoors in queries:
+        try:
+            target = node_id(adjacency, end)
+        except ValueError:
+            results.append(None)
+            continue
+        if dist[target] == INFINITY:
+            # end cannot be reached at all
+            results.append(None)
+            continue
+        if max_total_dist is None:
+            max_total_dist = INFINITY
+        if max_dist_outdoors is None:
+            max_dist_outdoors = INFINITY
+        if dist[target] > max_total_dist:
+            # the shortest route is already too long
+            results.append(None)
+        elif outside[target] <= max_dist_outdoors:
+            results.append((tree_path(adjacency, pred, target),
+                            dist[target], outside[target]))
+        else:
+            try:
+                results.append(shortest_path(digraph, start, end,
+                                             max_total_dist,
+                                             max_dist_outdoors))
+            except ValueError:
+                results.append(None)
+    return results
+
+
+def _route_group(task):
+    return route_group(_digraph, task[0], task[1])
+
+
+def route_batch(digraph, queries, processes=None, snapshot=None):
+    """
+    Answers a list of route queries.
+
+    Parameters:
+        digraph: Digraph instance, which must not change during the call
+        queries: list of (start, end) or (start, end, max_total_dist,
+            max_dist_outdoors) tuples, the limits being None for no limit
+        processes: number of worker processes (all CPUs if None, none if 1)
+        snapshot: optional file written by digraph.save_snapshot, which the
+            workers map instead of receiving the graph
+
+    Returns:
+        A list with, in the order of queries, the (path, total distance,
+        outdoor distance) tuple shortest_path gives for each one, or None
+        where no route satisfies it
+    """
+    queries = [normalize_query(query) for query in queries]
+    # distinct queries grouped by start building
+    groups = {}
+    for query in set(queries):
+        groups.setdefault(query[0], []).append(query[1:])
+    tasks = sorted(groups.items())
+    if processes == 1 or len(tasks) <= 1:
+        answers = [route_group(digraph, start, group)
+                   for start, group in tasks]
+    else:
+        digraph.get_adjacency()
+        pool = multiprocessing.Pool(processes, _init_worker,
+                                    (None if snapshot else digraph,
+                                     snapshot))
+        try:
+            answers = pool.map(_route_group, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    results = {}
+    for (start, group), answer in zip(tasks, answers):
+        for query, result in zip(group, answer):
+            results[(start,) + query] = result
+    return [results[query] for query in queries]
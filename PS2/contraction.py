@@ -0,0 +1,340 @@
+# 6.0002 Problem Set 2
+# Graph optimization
+#
+# Contraction hierarchy for repeated unconstrained route queries, e.g.
+#
+#   hierarchy = ContractionHierarchy.build(load_map("mit_map.txt"))
+#   hierarchy.save("mit_map.ch")
+#   ContractionHierarchy.load("mit_map.ch").query('32', '13')
+#
+# Nodes are contracted one at a time, least important first; contracting v
+# adds a shortcut u->w, carrying the summed total and outdoor distances,
+# for every u->v->w that is the only shortest route between u and w among
+# the nodes left. A query then searches upwards in rank from both ends and
+# only ever settles a few nodes, relaxing none of the edges of a node that
+# a higher one already reaches more cheaply (stall-on-demand). Distances
+# are compared as (total, outdoor) pairs, so answers have the distances of
+# shortest_path without limits.
+#
+# File layout (native byte order): a header (magic, version, number of
+# nodes, upward and downward edge counts, length of the name table), the
+# names separated by newlines, the int32 ranks, then for the upward and
+# the downward graph their int32 indptr, indices and middle node and their
+# float64 total and outdoor distances, each section padded to 8 bytes.
+
+import heapq
+import struct
+from array import array
+
+from routing import INFINITY
+
+MAGIC = b"CHRC"
+VERSION = 1
+HEADER = struct.Struct("=4sIIIII")
+NO_ROUTE = (INFINITY, INFINITY)
+
+
+def _plus(a, b):
+    return (a[0] + b[0], a[1] + b[1])
+
+
+def _witness_search(out, source, skip, limit, settle_limit, targets):
+    """Best (total, outdoor) from source to the nodes within limit, avoiding
+    skip, settling at most settle_limit nodes and stopping once every node
+    of targets is settled. out holds the edges between the nodes not
+    contracted yet."""
+    best = {source: (0.0, 0.0)}
+    done = set()
+    left = len(targets)
+    heap = [((0.0, 0.0), source)]
+    while heap and len(done) < settle_limit:
+        cost, u = heapq.heappop(heap)
+        if u in done:
+            continue
+        done.add(u)
+        if u in targets:
+            left -= 1
+            if not left:
+                break
+        for w, edge in out[u].items():
+            if w == skip:
+                continue
+            new = (cost[0] + edge[0], cost[1] + edge[1])
+            if new <= limit and new < best.get(w, NO_ROUTE):
+                best[w] = new
+                heapq.heappush(heap, (new, w))
+    return best
+
+
+def _shortcuts(out, inn, v, settle_limit):
+    """Shortcuts (u, w, (total, outdoor, middle)) that contracting v needs,
+    out and inn holding the edges between the nodes not contracted yet."""
+    shortcuts = []
+    targets = list(out[v].items())
+    if not targets:
+        return shortcuts
+    for u, first in inn[v].items():
+        via = [(w, _plus(first, edge)) for w, edge in targets if w != u]
+        if not via:
+            continue
+        limit = max(cost for _, cost in via)
+        best = _witness_search(out, u, v, limit, settle_limit,
+                               set(w for w, _ in via))
+        for w, cost in via:
+            if best.get(w, NO_ROUTE) > cost:
+                shortcuts.append((u, w, (cost[0], cost[1], v)))
+    return shortcuts
+
+
+def _csr(n, edges):
+    """Packs lists of (node, total, outdoor, middle) per node into
+    (indptr, indices, middle, total, outdoor) arrays."""
+    indptr = array('i', [0])
+    indices, middle = array('i'), array('i')
+    total, outdoor = array('d'), array('d')
+    for u in range(n):
+        for w, t, o, m in sorted(edges[u]):
+            indices.append(w)
+            total.append(t)
+            outdoor.append(o)
+            middle.append(m)
+        indptr.append(len(indices))
+    return indptr, indices, middle, total, outdoor
+
+
+class ContractionHierarchy(object):
+    """Upward and downward graphs of a contraction hierarchy over the
+    CompactAdjacency ids of a Digraph. up holds the edges u->w with
+    rank[u] < rank[w] under u, down the edges u->w with rank[u] > rank[w]
+    under w, both as (indptr, indices, middle, total, outdoor) arrays;
+    middle is the contracted node a shortcut skips, -1 for map edges."""
+    def __init__(self, names, rank, up, down):
+        self.names = names
+        self.ids = dict((name, i) for i, name in enumerate(names))
+        self.rank = rank
+        self.up = up
+        self.down = down
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def build(cls, digraph, settle_limit=500, estimate_limit=20):
+        """
+        Contracts the nodes of digraph by increasing edge difference
+        (shortcuts added less edges removed, plus the contracted
+        neighbours), updated lazily as nodes are taken.
+
+        Parameters:
+            digraph: Digraph instance
+            settle_limit: most nodes a witness search may settle when a
+                node is contracted; a search cut short adds its shortcut,
+                which is always safe
+            estimate_limit: most nodes a witness search may settle when
+                only estimating the edge difference of a node, which is
+                done far more often than contracting it
+
+        Returns:
+            A ContractionHierarchy
+        """
+        adjacency = digraph.get_adjacency()
+        n = len(adjacency)
+        out = [{} for _ in range(n)]
+        inn = [{} for _ in range(n)]
+
+        def add(u, w, edge):
+            if u != w and edge[:2] < out[u].get(w, NO_ROUTE)[:2]:
+                out[u][w] = inn[w][u] = edge
+
+        for u in range(n):
+            for w, total, outdoor in adjacency.neighbors(u):
+                add(u, w, (total, outdoor, -1))
+        neighbours = [0] * n
+
+        def priority(v):
+            added = len(_shortcuts(out, inn, v, estimate_limit))
+            return added - len(out[v]) - len(inn[v]) + neighbours[v]
+
+        heap = [(priority(v), v) for v in range(n)]
+        heapq.heapify(heap)
+        rank = array('i', [0] * n)
+        order = 0
+        up = [[] for _ in range(n)]
+        down = [[] for _ in range(n)]
+        while heap:
+            _, v = heapq.heappop(heap)
+            current = priority(v)
+            if heap and current > heap[0][0]:
+                heapq.heappush(heap, (current, v))
+                continue
+            for u, w, edge in _shortcuts(out, inn, v, settle_limit):
+                add(u, w, edge)
+            rank[v] = order
+            order += 1
+            # the edges left at v all lead to nodes ranked above it; they
+            # move to the hierarchy and out of later witness searches
+            for w in set(out[v]) | set(inn[v]):
+                neighbours[w] += 1
+            for w, (total, outdoor, middle) in out[v].items():
+                up[v].append((w, total, outdoor, middle))
+                del inn[w][v]
+            for u, (total, outdoor, middle) in inn[v].items():
+                down[v].append((u, total, outdoor, middle))
+                del out[u][v]
+            out[v] = inn[v] = None
+        names = [node.get_name() for node in adjacency.nodes]
+        return cls(names, rank, _csr(n, up), _csr(n, down))
+
+    def save(self, filename):
+        names = "\n".join(self.names).encode("utf-8")
+        with open(filename, "wb") as outFile:
+            outFile.write(HEADER.pack(MAGIC, VERSION, len(self.names),
+                                      len(self.up[1]), len(self.down[1]),
+                                      len(names)))
+            outFile.write(names)
+            for section in (self.rank,) + self.up + self.down:
+                outFile.write(b"\0" * (-outFile.tell() % 8))
+                section.tofile(outFile)
+
+    @classmethod
+    def load(cls, filename):
+        """Reads a hierarchy written by save, raising a ValueError if the
+        file holds something else."""
+        with open(filename, "rb") as infile:
+            data = infile.read()
+        magic, version, n, m_up, m_down, length = \
+            HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(filename + " is not a contraction hierarchy")
+        names = data[HEADER.size:HEADER.size + length]
+        if bytes is not str:
+            names = names.decode("utf-8")
+        names = names.split("\n") if n else []
+        offset = [HEADER.size + length]
+
+        def section(typecode, count):
+            start = offset[0] + (-offset[0] % 8)
+            offset[0] = start + count * array(typecode).itemsize
+            return array(typecode, data[start:offset[0]])
+
+        rank = section('i', n)
+        graphs = []
+        for m in (m_up, m_down):
+            graphs.append((section('i', n + 1), section('i', m),
+                           section('i', m), section('d', m),
+                           section('d', m)))
+        return cls(names, rank, graphs[0], graphs[1])
+
+    def node_id(self, name):
+        i = self.ids.get(name)
+        if i is None:
+            raise ValueError("Node not in graph")
+        return i
+
+    def middle(self, u, w):
+        """Node skipped by the edge u->w, -1 if it is an edge of the map."""
+        if self.rank[u] < self.rank[w]:
+            indptr, indices, middle = self.up[:3]
+            i, j = u, w
+        else:
+            indptr, indices, middle = self.down[:3]
+            i, j = w, u
+        for k in range(indptr[i], indptr[i + 1]):
+            if indices[k] == j:
+                return middle[k]
+        raise ValueError("no edge " + self.names[u] + "->" + self.names[w])
+
+    @staticmethod
+    def _stalled(above, cost, u, label):
+        """Stall-on-demand: whether some node ranked above u already
+        reached by the search leads to u more cheaply than label, in which
+        case label is not a shortest route to u and u's edges need not be
+        relaxed. above holds those edges into u."""
+        indptr, indices, _, total, outdoor = above
+        for k in range(indptr[u], indptr[u + 1]):
+            reached = cost.get(indices[k])
+            if reached is not None and \
+                    (reached[0] + total[k], reached[1] + outdoor[k]) < label:
+                return True
+        return False
+
+    def query(self, start, end, expanded=None):
+        """
+        Shortest path from start to end.
+
+        Parameters:
+            start: string
+                Building number at which to start
+            end: string
+                Building number at which to end
+            expanded: set, optional
+                If given, receives the ids of the nodes either search
+                settled
+
+        Returns:
+            A tuple (path, total distance, outdoor distance) as in
+            routing.shortest_path. Raises a ValueError if either building
+            is not in the graph or end cannot be reached.
+        """
+        source, target = self.node_id(start), self.node_id(end)
+        # per side: graph searched, graph of the edges into a node from
+        # above it, best cost so far, previous node, settled, heap
+        sides = [(self.up, self.down, {source: (0.0, 0.0)}, {source: -1},
+                  set(), [((0.0, 0.0), source)]),
+                 (self.down, self.up, {target: (0.0, 0.0)}, {target: -1},
+                  set(), [((0.0, 0.0), target)])]
+        best, meet = NO_ROUTE, -1
+        while sides[0][5] or sides[1][5]:
+            for graph, above, cost, pred, done, heap in sides:
+                if not heap:
+                    continue
+                if heap[0][0] >= best:
+                    del heap[:]
+                    continue
+                label, u = heapq.heappop(heap)
+                if u in done:
+                    continue
+                done.add(u)
+                other = sides[1][2] if cost is sides[0][2] else sides[0][2]
+                if u in other and _plus(label, other[u]) < best:
+                    best, meet = _plus(label, other[u]), u
+                if self._stalled(above, cost, u, label):
+                    continue
+                indptr, indices, _, total, outdoor = graph
+                for k in range(indptr[u], indptr[u + 1]):
+                    w = indices[k]
+                    new = (label[0] + total[k], label[1] + outdoor[k])
+                    if new < cost.get(w, NO_ROUTE):
+                        cost[w] = new
+                        pred[w] = u
+                        heapq.heappush(heap, (new, w))
+        if expanded is not None:
+            expanded.update(sides[0][4])
+            expanded.update(sides[1][4])
+        if meet == -1:
+            raise ValueError("No path satisfies the constraints")
+        # hierarchy edges from start to meet, then from meet to end
+        hops = []
+        forward, backward = sides[0][3], sides[1][3]
+        u = meet
+        while forward[u] != -1:
+            hops.append((forward[u], u))
+            u = forward[u]
+        hops.reverse()
+        u = meet
+        while backward[u] != -1:
+            hops.append((u, backward[u]))
+            u = backward[u]
+        path = [source]
+        for hop in hops:
+            # unpack shortcuts, leftmost part first
+            stack = [hop]
+            while stack:
+                u, w = stack.pop()
+                m = self.middle(u, w)
+                if m == -1:
+                    path.append(w)
+                else:
+                    stack.append((m, w))
+                    stack.append((u, m))
+        return [self.names[i] for i in path], best[0], best[1]
@@ -5,19 +5,42 @@
 # Time:
 
 import unittest
+import mmap
+from collections import OrderedDict
+import struct
+from array import array
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 #
 # A set of data structures to represent graphs
 #
 
 class Node(object):
-    """Represents a node in the graph"""
-    def __init__(self, name):
-        self.name = str(name)
+    """Represents a node in the graph. Nodes are immutable and slotted, with
+    their hash computed once; id is an optional integer tag (the position
+    of the name when the graph was bulk loaded)."""
+    __slots__ = ('name', 'id', '_hash')
+
+    def __init__(self, name, id=None):
+        object.__setattr__(self, 'name', str(name))
+        object.__setattr__(self, 'id', id)
+        object.__setattr__(self, '_hash', hash(self.name))
+
+    def __setattr__(self, attr, value):
+        raise AttributeError("Node is immutable")
+
+    def __reduce__(self):
+        return (Node, (self.name, self.id))
 
     def get_name(self):
         return self.name
 
+    def get_id(self):
+        return self.id
+
     def __str__(self):
         return self.name
 
@@ -25,23 +48,31 @@ class Node(object):
         return self.name
 
     def __eq__(self, other):
-        return self.name == other.name
+        return self is other or self.name == other.name
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
     def __hash__(self):
-        # This function is necessary so that Nodes can be used as
-        # keys in a dictionary, even though Nodes are mutable
-        return self.name.__hash__()
+        # Computed from the name in __init__, so that Nodes can be used as
+        # keys in a dictionary without rehashing the name on every lookup
+        return self._hash
 
 
 class Edge(object):
     """Represents an edge in the dictionary. Includes a source and
-    a destination."""
+    a destination. Edges are immutable."""
+    __slots__ = ('src', 'dest')
+
     def __init__(self, src, dest):
-        self.src = src
-        self.dest = dest
+        object.__setattr__(self, 'src', src)
+        object.__setattr__(self, 'dest', dest)
+
+    def __setattr__(self, attr, value):
+        raise AttributeError("Edge is immutable")
+
+    def __reduce__(self):
+        return (Edge, (self.src, self.dest))
 
     def get_source(self):
         return self.src
@@ -54,11 +85,16 @@ class Edge(object):
 
 
 class WeightedEdge(Edge):
+    __slots__ = ('total_distance', 'outdoor_distance')
+
     def __init__(self, src, dest, total_distance, outdoor_distance):
-        self.src=src
-        self.dest=dest
-        self.total_distance=total_distance
-        self.outdoor_distance=outdoor_distance
+        Edge.__init__(self, src, dest)
+        object.__setattr__(self, 'total_distance', total_distance)
+        object.__setattr__(self, 'outdoor_distance', outdoor_distance)
+
+    def __reduce__(self):
+        return (WeightedEdge, (self.src, self.dest, self.total_distance,
+                               self.outdoor_distance))
 
     def get_total_distance(self):
         return self.total_distance
@@ -71,11 +107,233 @@ class WeightedEdge(Edge):
         " ("+str(self.total_distance)+", "+str(self.outdoor_distance)+")"
         return s
 
+def _numbered(nodes):
+    """Returns the nodes as a list ordered by id if their ids are exactly
+    0..n-1, else sorted by name."""
+    ordered = [None] * len(nodes)
+    for node in nodes:
+        i = node.get_id()
+        if not (isinstance(i, int) and 0 <= i < len(ordered)) or \
+                ordered[i] is not None:
+            return sorted(nodes, key=Node.get_name)
+        ordered[i] = node
+    return ordered
+
+
+class CompactAdjacency(object):
+    """CSR view of a Digraph: nodes are numbered 0..n-1 (by Node id when
+    the ids are exactly 0..n-1, as for graphs built by from_edge_list or
+    from_csr, else sorted by name) and the edges leaving node i are
+    indices[indptr[i]:indptr[i+1]], with their distances at the same
+    positions of total and outdoor."""
+    def __init__(self, digraph):
+        self.nodes = _numbered(digraph.nodes)
+        self.ids = dict((node, i) for i, node in enumerate(self.nodes))
+        self.indptr = array('l', [0])
+        self.indices = array('l')
+        self.total = array('d')
+        self.outdoor = array('d')
+        for node in self.nodes:
+            for edge in digraph.edges[node]:
+                self.indices.append(self.ids[edge.get_destination()])
+                self.total.append(float(edge.get_total_distance()))
+                self.outdoor.append(float(edge.get_outdoor_distance()))
+            self.indptr.append(len(self.indices))
+        self.reverse = None
+
+    @classmethod
+    def from_arrays(cls, nodes, indptr, indices, total, outdoor):
+        """Wraps existing CSR arrays (or any sequences indexed the same way)
+        without copying them."""
+        adjacency = cls.__new__(cls)
+        adjacency.nodes = nodes
+        adjacency.ids = dict((node, i) for i, node in enumerate(nodes))
+        adjacency.indptr = indptr
+        adjacency.indices = indices
+        adjacency.total = total
+        adjacency.outdoor = outdoor
+        adjacency.reverse = None
+        return adjacency
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def reversed(self):
+        """Returns the CompactAdjacency of the graph with every edge turned
+        around, numbering the nodes the same way, built by counting sort on
+        first use."""
+        if self.reverse is None:
+            n = len(self.nodes)
+            indptr = array('l', [0] * (n + 1))
+            for j in self.indices:
+                indptr[j + 1] += 1
+            for i in range(n):
+                indptr[i + 1] += indptr[i]
+            fill = array('l', indptr)
+            indices = array('l', [0] * len(self.indices))
+            total = array('d', indices)
+            outdoor = array('d', indices)
+            for i in range(n):
+                for k in range(self.indptr[i], self.indptr[i + 1]):
+                    j = self.indices[k]
+                    indices[fill[j]] = i
+                    total[fill[j]] = self.total[k]
+                    outdoor[fill[j]] = self.outdoor[k]
+                    fill[j] += 1
+            self.reverse = CompactAdjacency.from_arrays(
+                self.nodes, indptr, indices, total, outdoor)
+            self.reverse.ids = self.ids
+            self.reverse.reverse = self
+        return self.reverse
+
+    def neighbors(self, i):
+        """Yields (destination id, total distance, outdoor distance) for the
+        edges leaving node id i."""
+        for k in range(self.indptr[i], self.indptr[i + 1]):
+            yield self.indices[k], self.total[k], self.outdoor[k]
+
+
+class Reachability(object):
+    """Strongly connected components of a CompactAdjacency, found with an
+    iterative Tarjan search, and for each component the components its
+    nodes can reach, as a bitset over the condensation DAG. Tarjan numbers
+    the components sinks first, so every edge of the DAG goes from a
+    component to a lower-numbered one."""
+    def __init__(self, adjacency):
+        indptr, indices = adjacency.indptr, adjacency.indices
+        n = len(adjacency)
+        self.component = array('l', [-1] * n)
+        index = [-1] * n
+        low = [0] * n
+        on_stack = bytearray(n)
+        stack = []
+        counter = 0
+        count = 0
+        for root in range(n):
+            if index[root] != -1:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            work = [[root, indptr[root]]]
+            while work:
+                u, k = work[-1]
+                if k < indptr[u + 1]:
+                    work[-1][1] = k + 1
+                    v = indices[k]
+                    if index[v] == -1:
+                        index[v] = low[v] = counter
+                        counter += 1
+                        stack.append(v)
+                        on_stack[v] = 1
+                        work.append([v, indptr[v]])
+                    elif on_stack[v]:
+                        low[u] = min(low[u], index[v])
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[u])
+                if low[u] == index[u]:
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = 0
+                        self.component[w] = count
+                        if w == u:
+                            break
+                    count += 1
+        self.count = count
+        members = [[] for _ in range(count)]
+        for u in range(n):
+            members[self.component[u]].append(u)
+        self.reach = [0] * count
+        for c in range(count):
+            reach = 1 << c
+            for u in members[c]:
+                for k in range(indptr[u], indptr[u + 1]):
+                    reach |= self.reach[self.component[indices[k]]]
+            self.reach[c] = reach
+
+    def __len__(self):
+        return self.count
+
+    def reaches(self, i, j):
+        """Whether there is a path from node id i to node id j."""
+        return (self.reach[self.component[i]] >> self.component[j]) & 1 == 1
+
+
+# Snapshot layout (native byte order): a header (magic, version, number of
+# nodes, number of edges, length of the name table, bytes per distance),
+# the node names separated by newlines, then indptr and indices as int32 and
+# total and outdoor as float32 or float64, each section padded to 8 bytes.
+SNAPSHOT_MAGIC = b"GRPH"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("=4sIIIII")
+
+
+def _padded(size):
+    return size + (-size % 8)
+
+
+def _snapshot_view(data, offset, typecode, count):
+    """Returns count items of type typecode at offset of the mapped file:
+    a numpy array or a cast memoryview sharing its pages where possible,
+    an array copy otherwise."""
+    size = count * array(typecode).itemsize
+    if np is not None:
+        return np.frombuffer(data, np.dtype(typecode), count, offset)
+    if count and hasattr(memoryview, 'cast'):
+        return memoryview(data)[offset:offset + size].cast(typecode)
+    return array(typecode, data[offset:offset + size])
+
+
+class RouteCache(object):
+    """LRU cache of route answers holding at most maxsize of them. Keys
+    end with the version of the graph they were answered on, so answers
+    from before a change to the graph are never returned."""
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.routes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.routes)
+
+    def clear(self):
+        self.routes.clear()
+
+    def get(self, key, default=None):
+        """Returns the answer cached for key, default if there is none."""
+        if key in self.routes:
+            self.hits += 1
+            route = self.routes.pop(key)
+            self.routes[key] = route
+            return route
+        self.misses += 1
+        return default
+
+    def put(self, key, route):
+        if self.maxsize <= 0:
+            return
+        self.routes.pop(key, None)
+        while len(self.routes) >= self.maxsize:
+            self.routes.popitem(last=False)
+        self.routes[key] = route
+
+
 class Digraph(object):
     """Represents a directed graph of Node and Edge objects"""
-    def __init__(self):
+    def __init__(self, cache_size=1024):
         self.nodes = set([])
         self.edges = {}  # must be a dict of Node -> list of edges
+        self.edge_index = {}  # (src, dest) -> first edge between them
+        self.adjacency = None  # CompactAdjacency, built on demand
+        self.reachability = None  # Reachability, built on demand
+        self.frozen = False
+        self.version = 0  # incremented by every change to the graph
+        self.route_cache = RouteCache(cache_size)
 
     def __str__(self):
         edge_strs = []
@@ -100,26 +358,212 @@ class Digraph(object):
         return node in self.nodes
 
     def add_node(self, node):
+        if(self.frozen): raise ValueError("graph is frozen")
         if(node in self.nodes): raise ValueError("existing node")
         self.nodes.add(node)
         self.edges[node]=[] 
+        self.changed()
 
     def add_edge(self, edge):
+        if(self.frozen): raise ValueError("graph is frozen")
         src=edge.get_source()
         dest=edge.get_destination()
         if not(src in self.nodes and dest in self.nodes):\
         raise ValueError("Node not in graph")        
         self.edges[src].append(edge)
+        self.edge_index.setdefault((src,dest),edge)
+        self.changed()
+
+    def changed(self):
+        """Drops what was derived from the graph before a change: the
+        CompactAdjacency, the Reachability and the cached routes."""
+        self.version+=1
+        self.adjacency=None
+        self.reachability=None
+        self.route_cache.clear()
+
+    def get_edge(self, node1, node2):
+        """Returns the edge from node1 to node2, or None if there is none."""
+        return self.edge_index.get((node1,node2))
 
     def getDistance(self,node1, node2):
-        if not(node1 in self.nodes and node2 in self.nodes):
-         raise ValueError("Node not in graph") 
-        S=self.edges[node1]
-        for child in S:
-         if(child.get_destination()==node2):
-          return (float(child.get_total_distance()), float(child.get_outdoor_distance())) 
-
-        raise ValueError("nodes not existing")
+        edge=self.edge_index.get((node1,node2))
+        if(edge is None):
+         if not(node1 in self.nodes and node2 in self.nodes):
+          raise ValueError("Node not in graph") 
+         raise ValueError("nodes not existing")
+        return (float(edge.get_total_distance()), float(edge.get_outdoor_distance())) 
+
+    def get_adjacency(self):
+        """Returns the CompactAdjacency of the graph, building it if the graph
+        changed since it was last built."""
+        if(self.adjacency is None): self.adjacency=CompactAdjacency(self)
+        return self.adjacency
+
+    def get_reachability(self):
+        """Returns the Reachability of the graph, building it if the graph
+        changed since it was last built."""
+        if(self.reachability is None):
+            self.reachability=Reachability(self.get_adjacency())
+        return self.reachability
+
+    def can_reach(self, node1, node2):
+        """Whether some path leads from node1 to node2."""
+        ids=self.get_adjacency().ids
+        if not(node1 in ids and node2 in ids): raise ValueError("Node not in graph")
+        return self.get_reachability().reaches(ids[node1],ids[node2])
+
+    def freeze(self):
+        """Builds the CompactAdjacency and makes the graph read-only: later
+        add_node and add_edge calls raise a ValueError."""
+        self.get_adjacency()
+        self.frozen=True
+
+    def __getattr__(self, attr):
+        # a graph built from CSR arrays builds its edge objects on first use
+        if(attr in ('edges','edge_index') and self.__dict__.get('lazy_edges')):
+            self.build_edges()
+            return self.__dict__[attr]
+        raise AttributeError(attr)
+
+    def build_edges(self):
+        """Creates the WeightedEdge objects of a graph built by from_csr or
+        load_snapshot from its CompactAdjacency."""
+        adjacency=self.adjacency
+        edges={}
+        edge_index={}
+        for i, src in enumerate(adjacency.nodes):
+            edges[src]=[]
+            for j, total, outdoor in adjacency.neighbors(i):
+                edge=WeightedEdge(src,adjacency.nodes[j],float(total),float(outdoor))
+                edges[src].append(edge)
+                edge_index.setdefault((src,edge.dest),edge)
+        self.edges=edges
+        self.edge_index=edge_index
+        self.lazy_edges=False
+
+    def save_snapshot(self, filename, typecode='d'):
+        """Writes the graph's CompactAdjacency to filename in the snapshot
+        layout, with the distances as float64 ('d') or float32 ('f')."""
+        adjacency=self.get_adjacency()
+        names="\n".join(node.get_name() for node in adjacency.nodes)
+        names=names.encode("utf-8")
+        sections=[array('i',adjacency.indptr),array('i',adjacency.indices),
+                  array(typecode,adjacency.total),array(typecode,adjacency.outdoor)]
+        with open(filename,"wb") as outFile:
+            outFile.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC,SNAPSHOT_VERSION,
+                len(adjacency),len(adjacency.indices),len(names),
+                array(typecode).itemsize))
+            outFile.write(names)
+            for section in sections:
+                outFile.write(b"\0"*(-outFile.tell()%8))
+                section.tofile(outFile)
+
+    @classmethod
+    def load_snapshot(cls, filename):
+        """Maps a file written by save_snapshot and returns it as a frozen
+        graph. Its CompactAdjacency reads the mapped pages directly (through
+        numpy or memoryview when available), so loading costs only the
+        name table; the edge objects are built the first time edges or
+        edge_index is used."""
+        with open(filename,"rb") as infile:
+            data=mmap.mmap(infile.fileno(),0,access=mmap.ACCESS_READ)
+        magic,version,n,m,length,itemsize=SNAPSHOT_HEADER.unpack_from(data,0)
+        if(magic!=SNAPSHOT_MAGIC or version!=SNAPSHOT_VERSION):
+            raise ValueError(filename+" is not a graph snapshot")
+        names=data[SNAPSHOT_HEADER.size:SNAPSHOT_HEADER.size+length]
+        if(bytes is not str): names=names.decode("utf-8")
+        names=names.split("\n") if n else []
+        typecode='d' if itemsize==8 else 'f'
+        offset=_padded(SNAPSHOT_HEADER.size+length)
+        indptr=_snapshot_view(data,offset,'i',n+1)
+        offset=_padded(offset+4*(n+1))
+        indices=_snapshot_view(data,offset,'i',m)
+        offset=_padded(offset+4*m)
+        total=_snapshot_view(data,offset,typecode,m)
+        offset=_padded(offset+itemsize*m)
+        outdoor=_snapshot_view(data,offset,typecode,m)
+        return cls.from_csr(names,indptr,indices,total,outdoor)
+
+    def to_csr(self, use_numpy=False):
+        """
+        Exports the graph as SciPy-style CSR arrays: the edges leaving node
+        i are indices[indptr[i]:indptr[i+1]], with their total and outdoor
+        distances at the same positions, e.g.
+        scipy.sparse.csr_matrix((total, indices, indptr)).
+
+        Parameters:
+        use_numpy - whether to return numpy arrays (sharing the memory of
+            the CompactAdjacency) instead of array.array (a bool)
+
+        Returns:
+        A tuple (indptr, indices, total, outdoor, names), names[i] being
+        the name of node i; when the Node ids are exactly 0..n-1 node i is
+        the one whose get_id() is i
+        """
+        if(use_numpy and np is None): raise ImportError("numpy is not installed")
+        adjacency=self.get_adjacency()
+        arrays=[adjacency.indptr,adjacency.indices,adjacency.total,adjacency.outdoor]
+        if(use_numpy): arrays=[np.asarray(a) for a in arrays]
+        return tuple(arrays)+([node.get_name() for node in adjacency.nodes],)
+
+    @classmethod
+    def from_csr(cls, names, indptr, indices, total, outdoor, frozen=True):
+        """Builds a graph over CSR arrays laid out as in to_csr, using them
+        as its CompactAdjacency without copying. Only the nodes are created
+        up front; the edge objects are built the first time edges or
+        edge_index is used. The graph is frozen unless frozen is False, in
+        which case the arrays must not be shared with anything else."""
+        n=len(names)
+        m=len(indices)
+        if(len(indptr)!=n+1 or indptr[0]!=0 or indptr[n]!=m or
+           len(total)!=m or len(outdoor)!=m):
+            raise ValueError("inconsistent CSR arrays")
+        nodes=[Node(name,i) for i,name in enumerate(names)]
+        graph=cls()
+        graph.nodes=set(nodes)
+        if(len(graph.nodes)!=n): raise ValueError("existing node")
+        del graph.edges, graph.edge_index
+        graph.lazy_edges=True
+        graph.adjacency=CompactAdjacency.from_arrays(nodes,indptr,indices,total,outdoor)
+        graph.frozen=frozen
+        return graph
+
+    @classmethod
+    def from_edge_list(cls, names, src, dest, total, outdoor):
+        """Builds a graph from parallel sequences (lists, arrays or numpy
+        arrays): edge k goes from names[src[k]] to names[dest[k]] and has
+        distances total[k] and outdoor[k]. Names must be unique. The edges
+        are counting-sorted by source into CSR arrays, keeping their order,
+        and handed to from_csr, so no edge object is created until edges
+        or edge_index is used."""
+        n=len(names)
+        if(np is not None and isinstance(src,np.ndarray)):
+            order=np.argsort(src,kind='mergesort')
+            indptr=np.zeros(n+1,dtype=np.intp)
+            np.cumsum(np.bincount(src,minlength=n),out=indptr[1:])
+            return cls.from_csr(list(names),indptr,np.asarray(dest)[order],
+                                np.asarray(total,dtype=float)[order],
+                                np.asarray(outdoor,dtype=float)[order],
+                                frozen=False)
+        m=len(src)
+        indptr=array('l',[0]*(n+1))
+        for i in src:
+            indptr[i+1]+=1
+        for i in range(n):
+            indptr[i+1]+=indptr[i]
+        fill=array('l',indptr[:n])
+        indices=array('l',[0]*m)
+        totals=array('d',indices)
+        outdoors=array('d',indices)
+        for k in range(m):
+            i=src[k]
+            position=fill[i]
+            fill[i]=position+1
+            indices[position]=dest[k]
+            totals[position]=total[k]
+            outdoors[position]=outdoor[k]
+        return cls.from_csr(names,indptr,indices,totals,outdoors,frozen=False)
 
 '''
 def totalCost(g,path):
@@ -1,20 +1,51 @@
 import unittest
-from graph import Digraph, Node, WeightedEdge
+from graph import Digraph, Node
 import time
+from array import array
+try:
+    import numpy as np
+except ImportError:
+    np=None
+from routing import bidirectional_path, cached_route, shortest_path
 
-def load_map(map_filename):
- g=Digraph()
- infile=open(map_filename,"r") 
- 
- for line in infile:
-  coord=line.split()
-  n1=Node(coord[0])
-  n2=Node(coord[1])
-  e=WeightedEdge(n1,n2,coord[2],coord[3])
-  if(not g.has_node(n1)): g.add_node(n1)
-  if(not g.has_node(n2)): g.add_node(n2)
-  g.add_edge(e)
- return g
+def load_map(map_filename, use_numpy=False):
+ """
+ Reads a map whose lines are "src dest total_distance outdoor_distance"
+ into a Digraph. Building names are interned to integer ids and the
+ distances kept in float arrays while reading, then Digraph.from_edge_list
+ sorts them into CSR arrays; the edge objects are only built if the
+ graph's edges are used.
+
+ Parameters:
+  map_filename - name of the map file (a string)
+  use_numpy - whether to parse the file with numpy.loadtxt (a bool)
+ """
+ if(use_numpy):
+  if(np is None): raise ImportError("numpy is not installed")
+  data=np.loadtxt(map_filename,dtype=str,ndmin=2)
+  names,ids=np.unique(data[:,:2],return_inverse=True)
+  ids=ids.reshape(-1,2)
+  return Digraph.from_edge_list(names.tolist(),ids[:,0],ids[:,1],
+   data[:,2].astype(float),data[:,3].astype(float))
+ ids={}
+ names=[]
+ src=array('l')
+ dest=array('l')
+ total=array('d')
+ outdoor=array('d')
+ with open(map_filename,"r") as infile:
+  for line in infile:
+   coord=line.split()
+   if(not coord): continue
+   for name,column in ((coord[0],src),(coord[1],dest)):
+    i=ids.get(name)
+    if(i is None):
+     i=ids[name]=len(names)
+     names.append(name)
+    column.append(i)
+   total.append(float(coord[2]))
+   outdoor.append(float(coord[3]))
+ return Digraph.from_edge_list(names,src,dest,total,outdoor)
 
 def totalCost(g,path):
  totalD=0.0
@@ -25,38 +56,238 @@ def totalCost(g,path):
   outdoors+=total[1]
  return (totalD, outdoors)
 
-def DFSW(graph, start, end, path=[],shortest=None):
- path=path+[start]
- if shortest!=None:
-  if(totalCost(g,path)[0]>totalCost(g,shortest)[0]): return shortest
- if(start==end):  
-  return path
- for node in g.get_edges_for_node(start):
-  node=node.get_destination()
-  if(node not in path):
-    newPath=DFSW(graph,node, end, path,shortest)  
-    if(newPath!=None):
-     if(shortest==None): shortest=newPath
-     else:
-       if(totalCost(graph,shortest)[0]>totalCost(graph,newPath)[0]): shortest=newPath
- return shortest
-  
-def get_best_path(digraph,start,end):
-  start=Node(start)
-  end=Node(end)
-  if(not digraph.has_node(start) or not digraph.has_node(end)):
-   raise ValueError("Node not in graph")
-  init=time.time() 
-  best=DFSW(digraph, start, end)
-  final=time.time()
-  print "best path:", best, "total distance:", totalCost(g,best)[0], "outdoors:", totalCost(g,best)[1] 
-  print "time using brute force:", final-init
-
-g=load_map("mit_map.txt")
-#print g
-n1="32"
-n2="13"
-get_best_path(g,n1,n2)
+def get_best_path(digraph, start, end, path, max_dist_outdoors, best_dist,
+                  best_path, on_path=None):
+    """
+    Finds the shortest path between buildings subject to constraints.
+
+    The path is extended and shrunk in place and carries its running total
+    and outdoor distances, so each step costs O(1) and a branch is cut as
+    soon as it is no shorter than the best path found, walks too far
+    outdoors or enters a building from which end cannot be reached.
+
+    Parameters:
+        digraph: Digraph instance
+            The graph on which to carry out the search
+        start: string
+            Building number at which to start
+        end: string
+            Building number at which to end
+        path: list composed of [[list of strings], int, int]
+            Represents the current path of nodes being traversed. Contains
+            a list of node names, total distance traveled, and total
+            distance outdoors.
+        max_dist_outdoors: int
+            Maximum distance spent outdoors on a path
+        best_dist: int
+            The smallest distance between the original start and end node
+            for the initial problem that you are trying to solve
+        best_path: list of strings
+            The shortest path found so far between the original start
+            and end node.
+        on_path: set of strings, optional
+            The building numbers in path[0], for O(1) cycle checks
+
+    Returns:
+        A tuple with the shortest-path from start to end, represented by
+        a list of building numbers (in strings), [n_1, n_2, ..., n_k],
+        where there exists an edge from n_i to n_(i+1) in digraph,
+        for all 1 <= i < k and the distance of that path.
+
+        If there exists no path that satisfies max_total_dist and
+        max_dist_outdoors constraints, then return None.
+
+        Answers to new queries (an empty path and no best_path) are kept in
+        digraph.route_cache until the graph changes.
+    """
+    if on_path is None and not path[0] and best_path is None:
+        result = cached_route(
+            digraph, ("get_best_path", start, end, path[1], path[2],
+                      max_dist_outdoors, best_dist),
+            lambda: get_best_path(digraph, start, end, path,
+                                  max_dist_outdoors, best_dist, None, set()))
+        if(result is None): return None
+        return list(result[0]), result[1]
+    if on_path is None:
+        on_path = set(path[0])
+    ids = digraph.get_adjacency().ids
+    reachability = digraph.get_reachability()
+    target = ids[Node(end)]
+    if(not reachability.reaches(ids[Node(start)], target)): return None
+    names, total, outdoor = path
+    names.append(start)
+    on_path.add(start)
+    if start == end:
+        best_path, best_dist = list(names), total
+    else:
+        for edge in digraph.get_edges_for_node(Node(start)):
+            node = edge.get_destination().get_name()
+            if(node in on_path): continue
+            if(not reachability.reaches(ids[edge.get_destination()], target)): continue
+            new_total = total + edge.get_total_distance()
+            new_outdoor = outdoor + edge.get_outdoor_distance()
+            if(new_outdoor > max_dist_outdoors): continue
+            if(new_total > best_dist): continue
+            if(best_path is not None and new_total >= best_dist): continue
+            path[1], path[2] = new_total, new_outdoor
+            result = get_best_path(digraph, node, end, path,
+                                   max_dist_outdoors, best_dist, best_path,
+                                   on_path)
+            if(result is not None): best_path, best_dist = result
+        path[1], path[2] = total, outdoor
+    names.pop()
+    on_path.discard(start)
+    if(best_path is None): return None
+    return best_path, best_dist
+
+
+def directed_dfs(digraph, start, end, max_total_dist, max_dist_outdoors):
+    """
+    Finds the shortest path from start to end using a directed depth-first
+    search. The total distance traveled on the path must not
+    exceed max_total_dist, and the distance spent outdoors on this path must
+    not exceed max_dist_outdoors. Answers come from get_best_path, which
+    keeps them in digraph.route_cache until the graph changes.
+
+    Parameters:
+        digraph: Digraph instance
+            The graph on which to carry out the search
+        start: string
+            Building number at which to start
+        end: string
+            Building number at which to end
+        max_total_dist: int
+            Maximum total distance on a path
+        max_dist_outdoors: int
+            Maximum distance spent outdoors on a path
+
+    Returns:
+        The shortest-path from start to end, represented by
+        a list of building numbers (in strings), [n_1, n_2, ..., n_k],
+        where there exists an edge from n_i to n_(i+1) in digraph,
+        for all 1 <= i < k
+
+        If there exists no path that satisfies max_total_dist and
+        max_dist_outdoors constraints, then raises a ValueError.
+    """
+    if(not digraph.has_node(Node(start)) or not digraph.has_node(Node(end))):
+        raise ValueError("Node not in graph")
+    result = get_best_path(digraph, start, end, [[], 0, 0],
+                           max_dist_outdoors, max_total_dist, None)
+    if(result is None):
+        raise ValueError("No path satisfies the constraints")
+    return result[0]
+
+def iterative_dfs(digraph, start, end, max_total_dist, max_dist_outdoors):
+    """
+    Drop-in for directed_dfs that keeps its own stack instead of recursing,
+    so path length is not bounded by the recursion limit. It walks the
+    CompactAdjacency of digraph in the same edge order and with the same
+    pruning as get_best_path, so both return the same path. The path is
+    kept in one preallocated buffer of node ids, with the running distances
+    and the next edge to try at each depth, and a bytearray marks the nodes
+    on the path. Queries end cannot be reached from are rejected up front
+    by the graph's Reachability, which also skips edges into buildings
+    that cannot reach end. Answers are kept in digraph.route_cache until
+    the graph changes.
+
+    Parameters:
+        as in directed_dfs
+
+    Returns:
+        The shortest-path from start to end as a list of building numbers.
+        If there exists no path that satisfies max_total_dist and
+        max_dist_outdoors constraints, then raises a ValueError.
+    """
+    if(not digraph.has_node(Node(start)) or not digraph.has_node(Node(end))):
+        raise ValueError("Node not in graph")
+    best_path = cached_route(
+        digraph, ("iterative_dfs", start, end, max_total_dist,
+                  max_dist_outdoors),
+        lambda: _iterative_search(digraph, start, end, max_total_dist,
+                                  max_dist_outdoors))
+    if(best_path is None):
+        raise ValueError("No path satisfies the constraints")
+    return list(best_path)
+
+def _iterative_search(digraph, start, end, max_total_dist, max_dist_outdoors):
+    """The search of iterative_dfs, returning None if no path satisfies the
+    constraints."""
+    adjacency = digraph.get_adjacency()
+    indptr, indices = adjacency.indptr, adjacency.indices
+    total, outdoor = adjacency.total, adjacency.outdoor
+    n = len(adjacency)
+    target = adjacency.ids[Node(end)]
+    reachability = digraph.get_reachability()
+    if(not reachability.reaches(adjacency.ids[Node(start)], target)):
+        return None
+    # component of target, and the components each component reaches
+    goal, component, reach = reachability.component[target], \
+        reachability.component, reachability.reach
+    path = array('l', [0] * n)
+    cursor = array('l', [0] * n)
+    dist = array('d', [0.0] * n)
+    outside = array('d', [0.0] * n)
+    on_path = bytearray(n)
+    best_dist, best_path = max_total_dist, None
+    path[0] = adjacency.ids[Node(start)]
+    cursor[0] = indptr[path[0]]
+    on_path[path[0]] = 1
+    depth = 0
+    if path[0] == target:
+        best_dist, best_path = 0, path[:1]
+        depth = -1
+    while depth >= 0:
+        u = path[depth]
+        k = cursor[depth]
+        if k == indptr[u + 1]:
+            # every edge of u tried: step back
+            on_path[u] = 0
+            depth -= 1
+            continue
+        cursor[depth] = k + 1
+        v = indices[k]
+        if(on_path[v]): continue
+        if(not (reach[component[v]] >> goal) & 1): continue
+        new_total = dist[depth] + total[k]
+        new_outdoor = outside[depth] + outdoor[k]
+        if(new_outdoor > max_dist_outdoors): continue
+        if(new_total > best_dist): continue
+        if(best_path is not None and new_total >= best_dist): continue
+        if v == target:
+            best_dist = new_total
+            best_path = path[:depth + 1]
+            best_path.append(v)
+            continue
+        depth += 1
+        path[depth] = v
+        cursor[depth] = indptr[v]
+        dist[depth] = new_total
+        outside[depth] = new_outdoor
+        on_path[v] = 1
+    if(best_path is None): return None
+    return [adjacency.nodes[i].get_name() for i in best_path]
+
+if __name__ == "__main__":
+ g=load_map("mit_map.txt")
+ #print g
+ n1="32"
+ n2="13"
+ init=time.time() 
+ best=directed_dfs(g, n1, n2, 99999, 99999)
+ final=time.time()
+ print "best path:", best, "total distance:", totalCost(g,[Node(n) for n in best])[0]
+ print "time using depth-first search:", final-init
+ init=time.time() 
+ best=shortest_path(g, n1, n2)
+ final=time.time()
+ print "best path:", best[0], "total distance:", best[1], "outdoors:", best[2] 
+ print "time using dijkstra:", final-init
+ init=time.time() 
+ best=bidirectional_path(g, n1, n2)
+ final=time.time()
+ print "best path:", best[0], "total distance:", best[1], "outdoors:", best[2] 
+ print "time using bidirectional dijkstra:", final-init
 
 
 
@@ -0,0 +1,747 @@
+#Test suite for Problem Set 2 (Graph optimization)
+
+import os
+import pickle
+import random
+import sys
+import tempfile
+import time
+import unittest
+
+import all_pairs
+import routing
+import batch_routing
+from contraction import ContractionHierarchy
+import ps2
+from graph import Digraph, Node, RouteCache, WeightedEdge
+from ps2 import directed_dfs, get_best_path, iterative_dfs, load_map
+from routing import astar, bidirectional_path, dijkstra, euclidean_heuristic, landmark_heuristic, \
+    landmark_table, load_coordinates, pareto_paths, shortest_path
+
+
+def grid_graph(size):
+    """size x size grid with 10m edges both ways, node i * size + j being
+    in row i and column j."""
+    graph = Digraph()
+    for i in range(size):
+        for j in range(size):
+            graph.add_node(Node(str(i * size + j)))
+    for i in range(size):
+        for j in range(size):
+            for di, dj in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+                if 0 <= i + di < size and 0 <= j + dj < size:
+                    graph.add_edge(WeightedEdge(
+                        Node(str(i * size + j)),
+                        Node(str((i + di) * size + j + dj)), 10, 0))
+    return graph
+
+
+def random_grid_graph(size, seed):
+    """size x size grid like grid_graph, each street having a random length
+    from 1 to 100 (the same both ways) with a random part of it outdoors."""
+    rng = random.Random(seed)
+    src, dest, total, outdoor = [], [], [], []
+    for i in range(size):
+        for j in range(size):
+            for di, dj in ((0, 1), (1, 0)):
+                if i + di < size and j + dj < size:
+                    u, v = i * size + j, (i + di) * size + j + dj
+                    length = rng.randint(1, 100)
+                    outside = rng.randint(0, length)
+                    src.extend((u, v))
+                    dest.extend((v, u))
+                    total.extend((length, length))
+                    outdoor.extend((outside, outside))
+    return Digraph.from_edge_list([str(i) for i in range(size * size)], src,
+                                  dest, total, outdoor)
+
+
+class TestGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.g = Digraph()
+        self.na = Node('a')
+        self.nb = Node('b')
+        self.nc = Node('c')
+        self.g.add_node(self.na)
+        self.g.add_node(self.nb)
+        self.g.add_node(self.nc)
+        self.e1 = WeightedEdge(self.na, self.nb, 15, 10)
+        self.e2 = WeightedEdge(self.na, self.nc, 14, 6)
+        self.e3 = WeightedEdge(self.nb, self.nc, 3, 1)
+        self.g.add_edge(self.e1)
+        self.g.add_edge(self.e2)
+        self.g.add_edge(self.e3)
+
+    def test_weighted_edge_str(self):
+        self.assertEqual(str(self.e1), "a->b (15, 10)")
+        self.assertEqual(str(self.e2), "a->c (14, 6)")
+        self.assertEqual(str(self.e3), "b->c (3, 1)")
+
+    def test_nodes_and_edges_are_immutable(self):
+        with self.assertRaises(AttributeError):
+            self.na.name = 'z'
+        with self.assertRaises(AttributeError):
+            self.e1.total_distance = 0
+        self.assertFalse(hasattr(self.na, '__dict__'))
+        self.assertFalse(hasattr(self.e1, '__dict__'))
+        self.assertEqual(hash(self.na), hash(Node('a')))
+        self.assertEqual(Node('a', 7).get_id(), 7)
+
+    def test_pickle_round_trip(self):
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            graph = pickle.loads(pickle.dumps(self.g, protocol))
+            self.assertEqual(str(graph), str(self.g))
+            self.assertTrue(graph.has_node(Node('c')))
+
+    def test_add_edge_to_nonexistent_node_raises(self):
+        node_not_in_graph = Node('q')
+        no_src = WeightedEdge(self.nb, node_not_in_graph, 5, 5)
+        no_dest = WeightedEdge(node_not_in_graph, self.na, 5, 5)
+
+        with self.assertRaises(ValueError):
+            self.g.add_edge(no_src)
+        with self.assertRaises(ValueError):
+            self.g.add_edge(no_dest)
+
+    def test_add_existing_node_raises(self):
+        with self.assertRaises(ValueError):
+            self.g.add_node(self.na)
+
+    def test_graph_str(self):
+        expected = "a->b (15, 10)\na->c (14, 6)\nb->c (3, 1)"
+        self.assertEqual(str(self.g), expected)
+
+    def test_get_distance(self):
+        self.assertEqual(self.g.getDistance(Node('a'), Node('c')), (14.0, 6.0))
+        self.assertTrue(self.g.get_edge(self.nb, self.nc) is self.e3)
+        self.assertEqual(self.g.get_edge(self.nc, self.na), None)
+        with self.assertRaises(ValueError):
+            self.g.getDistance(self.nc, self.na)
+        with self.assertRaises(ValueError):
+            self.g.getDistance(self.na, Node('q'))
+
+    def test_compact_adjacency(self):
+        adjacency = self.g.get_adjacency()
+        self.assertEqual(adjacency.nodes, [self.na, self.nb, self.nc])
+        self.assertEqual(list(adjacency.indptr), [0, 2, 3, 3])
+        self.assertEqual(list(adjacency.neighbors(0)),
+                         [(1, 15.0, 10.0), (2, 14.0, 6.0)])
+        reverse = adjacency.reversed()
+        self.assertEqual(list(reverse.indptr), [0, 0, 1, 3])
+        self.assertEqual(list(reverse.neighbors(2)),
+                         [(0, 14.0, 6.0), (1, 3.0, 1.0)])
+        self.assertTrue(reverse.reversed() is adjacency)
+        self.g.add_node(Node('d'))
+        self.assertEqual(len(self.g.get_adjacency()), 4)
+
+    def test_from_edge_list(self):
+        graph = Digraph.from_edge_list(['a', 'b', 'c'], [0, 0, 1], [1, 2, 2],
+                                       [15, 14, 3], [10, 6, 1])
+        # the distances are stored as floats and no edge exists until used
+        self.assertTrue(graph.lazy_edges)
+        self.assertFalse(graph.frozen)
+        self.assertEqual(str(graph), "a->b (15.0, 10.0)\na->c (14.0, 6.0)\n"
+                         "b->c (3.0, 1.0)")
+        self.assertEqual(graph.getDistance(self.nb, self.nc), (3.0, 1.0))
+        self.assertEqual([node.get_id() for node in
+                          graph.get_adjacency().nodes], [0, 1, 2])
+        graph.add_edge(WeightedEdge(self.nc, self.na, 1, 1))
+        self.assertEqual(graph.getDistance(self.nc, self.na), (1.0, 1.0))
+        self.assertEqual(list(graph.get_adjacency().indptr), [0, 2, 3, 4])
+        with self.assertRaises(ValueError):
+            Digraph.from_edge_list(['a', 'a'], [], [], [], [])
+
+    def test_csr_rows_follow_node_ids(self):
+        graph = load_map("mit_map.txt")
+        names = graph.to_csr()[4]
+        for node in graph.nodes:
+            self.assertEqual(names[node.get_id()], node.get_name())
+        self.assertEqual(names[0], '32')
+        # ids that are not exactly 0..n-1 fall back to sorting by name
+        graph = Digraph.from_edge_list(['b', 'a'], [0], [1], [1], [1])
+        graph.add_node(Node('c', 7))
+        self.assertEqual(graph.to_csr()[4], ['a', 'b', 'c'])
+
+    def test_route_cache(self):
+        version = self.g.version
+        self.assertEqual(shortest_path(self.g, 'a', 'c'), (['a', 'c'],
+                                                            14.0, 6.0))
+        path = shortest_path(self.g, 'a', 'c')
+        path[0].append('q')
+        self.assertEqual(shortest_path(self.g, 'a', 'c')[0], ['a', 'c'])
+        self.assertRaises(ValueError, shortest_path, self.g, 'c', 'a')
+        self.assertRaises(ValueError, shortest_path, self.g, 'c', 'a')
+        cache = self.g.route_cache
+        # c cannot reach a, which is known before the cache is consulted
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (2, 1, 1))
+        self.g.add_edge(WeightedEdge(self.nc, self.na, 1, 1))
+        self.assertEqual(self.g.version, version + 1)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(shortest_path(self.g, 'c', 'a')[0], ['c', 'a'])
+        self.assertEqual(cache.misses, 2)
+
+    def test_route_cache_covers_every_search(self):
+        graph = load_map("mit_map.txt")
+        cache = graph.route_cache
+        expected = directed_dfs(graph, '32', '56', 200, 200)
+        # answers handed out are copies of the cached ones
+        directed_dfs(graph, '32', '56', 200, 200).append('q')
+        self.assertEqual(directed_dfs(graph, '32', '56', 200, 200), expected)
+        self.assertEqual(get_best_path(graph, '32', '56', [[], 0, 0], 200,
+                                       200, None)[0], expected)
+        iterative_dfs(graph, '32', '56', 200, 200).append('q')
+        self.assertEqual(iterative_dfs(graph, '32', '56', 200, 200), expected)
+        routing.pareto_paths(graph, '32', '56')[0][0].append('q')
+        self.assertEqual(routing.pareto_paths(graph, '32', '56')[0][0][-1],
+                         '56')
+        self.assertEqual((cache.hits, cache.misses), (5, 3))
+        for _ in range(2):
+            self.assertRaises(ValueError, directed_dfs, graph, '32', '56',
+                              1, 1)
+        self.assertEqual((cache.hits, cache.misses), (6, 4))
+        graph.add_edge(WeightedEdge(Node('32'), Node('56'), 1, 1))
+        self.assertEqual(directed_dfs(graph, '32', '56', 200, 200),
+                         ['32', '56'])
+
+    def test_route_cache_evicts_oldest(self):
+        cache = RouteCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertEqual(list(cache.routes), ['a', 'c'])
+        self.assertEqual(cache.get('b', 0), 0)
+        RouteCache(0).put('a', 1)
+
+    def test_reachability(self):
+        reachability = self.g.get_reachability()
+        self.assertEqual(len(reachability), 3)
+        self.assertTrue(self.g.can_reach(self.na, self.nc))
+        self.assertFalse(self.g.can_reach(self.nc, self.nb))
+        with self.assertRaises(ValueError):
+            self.g.can_reach(self.na, Node('q'))
+        self.g.add_edge(WeightedEdge(self.nc, self.na, 1, 1))
+        self.assertEqual(len(self.g.get_reachability()), 1)
+        self.assertTrue(self.g.can_reach(self.nc, self.nb))
+
+    def test_reachability_of_map(self):
+        graph = load_map("mit_map.txt")
+        reachability = graph.get_reachability()
+        adjacency = graph.get_adjacency()
+        for i in range(len(adjacency)):
+            dist = dijkstra(graph, adjacency.nodes[i].get_name())[0]
+            for j in range(len(adjacency)):
+                self.assertEqual(reachability.reaches(i, j),
+                                 dist[j] < float('inf'))
+
+    def test_csr_round_trip(self):
+        indptr, indices, total, outdoor, names = self.g.to_csr()
+        self.assertEqual(names, ['a', 'b', 'c'])
+        self.assertEqual(list(indptr), [0, 2, 3, 3])
+        self.assertEqual(list(indices), [1, 2, 2])
+        self.assertEqual(list(total), [15.0, 14.0, 3.0])
+        self.assertEqual(list(outdoor), [10.0, 6.0, 1.0])
+        graph = Digraph.from_csr(['c', 'b', 'a'], [0, 0, 1, 3], [0, 1, 0],
+                                 [3, 15, 14], [1, 10, 6])
+        self.assertTrue(graph.lazy_edges)
+        self.assertEqual(shortest_path(graph, 'a', 'c'), (['a', 'c'], 14, 6))
+        self.assertTrue(graph.can_reach(self.nb, self.nc))
+        self.assertEqual(str(graph), "a->b (15.0, 10.0)\na->c (14.0, 6.0)\n"
+                         "b->c (3.0, 1.0)")
+        self.assertTrue(graph.frozen)
+        with self.assertRaises(ValueError):
+            Digraph.from_csr(['a', 'b'], [0, 1], [1], [1.0], [1.0])
+        with self.assertRaises(ValueError):
+            Digraph.from_csr(['a', 'a'], [0, 0, 0], [], [], [])
+
+    @unittest.skipIf(ps2.np is None, "numpy is not installed")
+    def test_csr_numpy(self):
+        indptr, indices, total, outdoor, names = self.g.to_csr(True)
+        self.assertEqual(indptr.tolist(), [0, 2, 3, 3])
+        graph = Digraph.from_csr(names, indptr, indices, total, outdoor)
+        self.assertEqual(shortest_path(graph, 'a', 'c')[1:], (14.0, 6.0))
+
+    def test_frozen_graph_raises(self):
+        self.g.freeze()
+        with self.assertRaises(ValueError):
+            self.g.add_node(Node('d'))
+        with self.assertRaises(ValueError):
+            self.g.add_edge(WeightedEdge(self.nc, self.na, 1, 1))
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = load_map("mit_map.txt")
+        handle, self.filename = tempfile.mkstemp()
+        os.close(handle)
+        self.addCleanup(os.remove, self.filename)
+
+    def test_round_trip(self):
+        self.graph.save_snapshot(self.filename)
+        graph = Digraph.load_snapshot(self.filename)
+        self.assertEqual(graph.nodes, self.graph.nodes)
+        self.assertEqual(str(graph), str(self.graph))
+        self.assertEqual(graph.getDistance(Node('32'), Node('56')),
+                         (80.0, 70.0))
+        with self.assertRaises(ValueError):
+            graph.add_node(Node('q'))
+
+    def test_routes_without_edge_objects(self):
+        self.graph.save_snapshot(self.filename, 'f')
+        graph = Digraph.load_snapshot(self.filename)
+        self.assertEqual(shortest_path(graph, '1', '32', None, 0),
+                         shortest_path(self.graph, '1', '32', None, 0))
+        self.assertTrue(graph.lazy_edges)
+        self.assertEqual(directed_dfs(graph, '2', '9', 99999, 0),
+                         ['2', '4', '10', '13', '9'])
+        self.assertFalse(graph.lazy_edges)
+
+    def test_not_a_snapshot_raises(self):
+        with open(self.filename, "wb") as outFile:
+            outFile.write(b"\0" * 64)
+        with self.assertRaises(ValueError):
+            Digraph.load_snapshot(self.filename)
+
+
+class TestRouting(unittest.TestCase):
+
+    LARGE_DIST = 99999
+
+    def setUp(self):
+        self.graph = load_map("mit_map.txt")
+
+    def find_path(self, start, end, total_dist, outdoor_dist):
+        return shortest_path(self.graph, start, end, total_dist,
+                             outdoor_dist)[0]
+
+    def _test_path(self, expectedPath, total_dist=LARGE_DIST,
+                   outdoor_dist=LARGE_DIST):
+        start, end = expectedPath[0], expectedPath[-1]
+        path = self.find_path(start, end, total_dist, outdoor_dist)
+        self.assertEqual(expectedPath, path)
+
+    def _test_impossible_path(self, start, end, total_dist=LARGE_DIST,
+                              outdoor_dist=LARGE_DIST):
+        with self.assertRaises(ValueError):
+            self.find_path(start, end, total_dist, outdoor_dist)
+
+    def test_load_map_basic(self):
+        self.assertTrue(isinstance(self.graph, Digraph))
+        self.assertEqual(len(self.graph.nodes), 37)
+        all_edges = []
+        for _, edges in self.graph.edges.items():
+            all_edges += edges
+        self.assertEqual(len(set(all_edges)), 129)
+        self.assertEqual(self.graph.getDistance(Node('32'), Node('56')),
+                         (80.0, 70.0))
+
+    @unittest.skipIf(ps2.np is None, "numpy is not installed")
+    def test_load_map_numpy(self):
+        graph = load_map("mit_map.txt", use_numpy=True)
+        self.assertEqual(str(graph), str(self.graph))
+
+    def test_path_one_step(self):
+        self._test_path(expectedPath=['32', '56'])
+
+    def test_path_no_outdoors(self):
+        self._test_path(
+            expectedPath=['32', '36', '26', '16', '56'], outdoor_dist=0)
+
+    def test_path_multi_step(self):
+        self._test_path(expectedPath=['2', '3', '7', '9'])
+
+    def test_path_multi_step_no_outdoors(self):
+        self._test_path(
+            expectedPath=['2', '4', '10', '13', '9'], outdoor_dist=0)
+
+    def test_path_multi_step2(self):
+        self._test_path(expectedPath=['1', '4', '12', '32'])
+
+    def test_path_multi_step_no_outdoors2(self):
+        self._test_path(
+            expectedPath=['1', '3', '10', '4', '12', '24', '34', '36', '32'],
+            outdoor_dist=0)
+
+    def test_impossible_path1(self):
+        self._test_impossible_path('8', '50', outdoor_dist=0)
+
+    def test_impossible_path2(self):
+        self._test_impossible_path('10', '32', total_dist=100)
+
+    def test_unknown_building_raises(self):
+        self._test_impossible_path('32', 'q')
+
+    def test_dijkstra_distances(self):
+        dist, pred = dijkstra(self.graph, '32')
+        ids = self.graph.get_adjacency().ids
+        self.assertEqual(dist[ids[Node('32')]], 0.0)
+        self.assertEqual(dist[ids[Node('13')]],
+                         shortest_path(self.graph, '32', '13')[1])
+        self.assertEqual(pred[ids[Node('32')]], -1)
+
+
+class TestPareto(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = load_map("mit_map.txt")
+
+    def check_front(self, start, end):
+        routes = pareto_paths(self.graph, start, end)
+        self.assertEqual(routes[0], shortest_path(self.graph, start, end))
+        for (_, total1, outdoor1), (_, total2, outdoor2) in \
+                zip(routes, routes[1:]):
+            self.assertTrue(total1 < total2 and outdoor1 > outdoor2)
+        for path, total, outdoor in routes:
+            # each route is the shortest one under its own outdoor limit
+            self.assertEqual(shortest_path(self.graph, start, end, None,
+                                           outdoor)[1:], (total, outdoor))
+        with self.assertRaises(ValueError):
+            shortest_path(self.graph, start, end, None, routes[-1][2] - 1)
+        return routes
+
+    def test_labels_skip_nodes_that_cannot_reach_end(self):
+        # b and d lead away from c and cannot come back
+        graph = Digraph.from_edge_list(['a', 'b', 'c', 'd'],
+                                       [0, 0, 1, 0], [1, 2, 3, 3],
+                                       [1.0, 5.0, 1.0, 1.0],
+                                       [0.0, 0.0, 0.0, 0.0])
+        adjacency = graph.get_adjacency()
+        expanded = set()
+        labels = list(routing._labels(adjacency, graph.get_reachability(),
+                                      0, 2, None, 10, expanded))
+        self.assertEqual([label[:2] for label in labels], [(5.0, 0.0)])
+        self.assertEqual(expanded, set([0, 2]))
+        self.assertEqual(pareto_paths(graph, 'a', 'c'), [(['a', 'c'], 5.0,
+                                                          0.0)])
+
+    def test_front(self):
+        routes = self.check_front('32', '56')
+        self.assertEqual(routes[-1][0], ['32', '36', '26', '16', '56'])
+        self.assertTrue(len(self.check_front('1', '32')) > 1)
+        self.check_front('2', '9')
+
+    def test_limits(self):
+        routes = pareto_paths(self.graph, '1', '32')
+        limited = pareto_paths(self.graph, '1', '32', routes[1][1])
+        self.assertEqual(limited, routes[:2])
+        with self.assertRaises(ValueError):
+            pareto_paths(self.graph, '8', '50', None, 0)
+
+
+class TestAStar(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = load_map("mit_map.txt")
+        self.names = sorted(node.get_name() for node in self.graph.nodes)
+
+    def grid(self, size):
+        # grid_graph with its coordinates in a file, 10m apart
+        handle, filename = tempfile.mkstemp()
+        with os.fdopen(handle, "w") as outFile:
+            for i in range(size):
+                for j in range(size):
+                    outFile.write("%d %d %d\n" % (i * size + j, 10 * i,
+                                                   10 * j))
+        self.addCleanup(os.remove, filename)
+        return grid_graph(size), load_coordinates(filename)
+
+    def test_landmarks_match_dijkstra(self):
+        h = landmark_heuristic(landmark_table(self.graph))
+        for start in self.names[::3]:
+            for end in self.names[1::4]:
+                try:
+                    expected = shortest_path(self.graph, start, end)[1]
+                except ValueError:
+                    self.assertRaises(ValueError, astar, self.graph, start,
+                                      end, h)
+                    continue
+                self.assertEqual(astar(self.graph, start, end, h)[1],
+                                 expected)
+
+    def test_euclidean_expands_fewer_nodes(self):
+        graph, coordinates = self.grid(12)
+        plain, guided = set(), set()
+        path = astar(graph, '0', '11', None, plain)
+        self.assertEqual(path[1], 110.0)
+        path = astar(graph, '0', '11',
+                     euclidean_heuristic(graph, coordinates), guided)
+        self.assertEqual(path[1], 110.0)
+        self.assertEqual(len(path[0]), 12)
+        self.assertTrue(len(guided) < len(plain) / 2)
+
+    def test_bidirectional_matches_dijkstra(self):
+        for start in self.names:
+            for end in self.names[::2]:
+                try:
+                    expected = shortest_path(self.graph, start, end)
+                except ValueError:
+                    self.assertRaises(ValueError, bidirectional_path,
+                                      self.graph, start, end)
+                    continue
+                path = bidirectional_path(self.graph, start, end)
+                self.assertEqual(path[1:], expected[1:])
+                self.assertEqual((path[0][0], path[0][-1]), (start, end))
+        self.assertEqual(bidirectional_path(self.graph, '32', '32'),
+                         (['32'], 0.0, 0.0))
+
+    def test_bidirectional_expands_fewer_nodes(self):
+        graph = grid_graph(31)
+        one_sided, two_sided = set(), set()
+        start, end = str(15 * 31 + 5), str(15 * 31 + 25)
+        self.assertEqual(astar(graph, start, end, None, one_sided)[1], 200.0)
+        path = bidirectional_path(graph, start, end, two_sided)
+        self.assertEqual(path[1], 200.0)
+        self.assertEqual(len(path[0]), 21)
+        self.assertTrue(len(two_sided) < 0.75 * len(one_sided))
+
+    def test_missing_coordinates_raise(self):
+        with self.assertRaises(ValueError):
+            euclidean_heuristic(self.graph, {'32': (0.0, 0.0)})
+
+
+class TestAllPairs(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = load_map("mit_map.txt")
+        self.names = sorted(node.get_name() for node in self.graph.nodes)
+        handle, self.filename = tempfile.mkstemp()
+        os.close(handle)
+        self.addCleanup(os.remove, self.filename)
+
+    def path_length(self, path):
+        # the map has parallel edges, so take the shortest of each hop
+        length = 0
+        for src, dest in zip(path, path[1:]):
+            length += min(edge.get_total_distance()
+                          for edge in self.graph.get_edges_for_node(Node(src))
+                          if edge.get_destination() == Node(dest))
+        return length
+
+    def check_table(self):
+        with all_pairs.PathTable(self.filename) as table:
+            self.assertEqual(len(table), 37)
+            for start in self.names:
+                for end in self.names:
+                    try:
+                        total = shortest_path(self.graph, start, end)[1]
+                    except ValueError:
+                        self.assertEqual(table.distance(start, end),
+                                         float('inf'))
+                        self.assertRaises(ValueError, table.path, start, end)
+                        continue
+                    self.assertEqual(table.distance(start, end), total)
+                    path = table.path(start, end)
+                    self.assertEqual(path[0], start)
+                    self.assertEqual(path[-1], end)
+                    self.assertEqual(self.path_length(path), total)
+            with self.assertRaises(ValueError):
+                table.distance('32', 'q')
+
+    def test_dijkstra_table(self):
+        all_pairs.precompute(self.graph, self.filename, "dijkstra", 1)
+        self.check_table()
+
+    def test_dijkstra_table_in_pool(self):
+        all_pairs.precompute(self.graph, self.filename, "dijkstra", 2)
+        self.check_table()
+
+    @unittest.skipIf(all_pairs.np is None, "numpy is not installed")
+    def test_floyd_warshall_table(self):
+        all_pairs.precompute(self.graph, self.filename, "floyd")
+        self.check_table()
+
+    def test_not_a_table_raises(self):
+        with open(self.filename, "wb") as outFile:
+            outFile.write(b"\0" * 64)
+        with self.assertRaises(ValueError):
+            all_pairs.PathTable(self.filename)
+
+
+class TestBatchRouting(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = load_map("mit_map.txt")
+        names = sorted(node.get_name() for node in self.graph.nodes)
+        self.queries = [('32', '56'), ('1', '32', None, 0), ('32', '56'),
+                        ('8', '50', 99999, 0), ('10', '32', 100),
+                        ('32', 'q'), ['2', '9', None, 0]]
+        for start in names[::5]:
+            for end in names[::3]:
+                self.queries.append((start, end, None, 40))
+                self.queries.append((start, end))
+
+    def check(self, results):
+        self.assertEqual(len(results), len(self.queries))
+        for query, result in zip(self.queries, results):
+            query = batch_routing.normalize_query(query)
+            try:
+                expected = shortest_path(self.graph, *query)
+            except ValueError:
+                self.assertEqual(result, None)
+                continue
+            self.assertEqual(result[1:], expected[1:])
+            self.assertEqual((result[0][0], result[0][-1]), query[:2])
+        self.assertEqual(results[1][0],
+                         ['1', '3', '10', '4', '12', '24', '34', '36', '32'])
+
+    def test_in_process(self):
+        self.check(batch_routing.route_batch(self.graph, self.queries, 1))
+
+    def test_in_pool(self):
+        self.check(batch_routing.route_batch(self.graph, self.queries, 2))
+
+    def test_in_pool_from_snapshot(self):
+        handle, filename = tempfile.mkstemp()
+        os.close(handle)
+        self.addCleanup(os.remove, filename)
+        self.graph.save_snapshot(filename)
+        self.check(batch_routing.route_batch(self.graph, self.queries, 2,
+                                             filename))
+
+    def test_unreachable_end(self):
+        graph = Digraph.from_edge_list(['a', 'b', 'c'], [0], [1], [1.0],
+                                       [0.0])
+        self.assertEqual(batch_routing.route_batch(
+            graph, [('a', 'c'), ('a', 'b'), ('c', 'a', 5, 5)], 1),
+            [None, (['a', 'b'], 1.0, 0.0), None])
+
+    def test_bad_query_raises(self):
+        with self.assertRaises(ValueError):
+            batch_routing.route_batch(self.graph, [('32',)])
+
+
+class TestContraction(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = load_map("mit_map.txt")
+        self.names = sorted(node.get_name() for node in self.graph.nodes)
+        self.hierarchy = ContractionHierarchy.build(self.graph)
+
+    def check_queries(self, hierarchy):
+        for start in self.names:
+            for end in self.names:
+                try:
+                    expected = shortest_path(self.graph, start, end)
+                except ValueError:
+                    self.assertRaises(ValueError, hierarchy.query, start,
+                                      end)
+                    continue
+                path, total, outdoor = hierarchy.query(start, end)
+                self.assertEqual((total, outdoor), expected[1:])
+                self.assertEqual((path[0], path[-1]), (start, end))
+                for src, dest in zip(path, path[1:]):
+                    self.assertTrue(self.graph.get_edge(Node(src),
+                                                        Node(dest)))
+
+    def test_queries(self):
+        self.check_queries(self.hierarchy)
+        with self.assertRaises(ValueError):
+            self.hierarchy.query('32', 'q')
+
+    def test_save_and_load(self):
+        handle, filename = tempfile.mkstemp()
+        os.close(handle)
+        self.addCleanup(os.remove, filename)
+        self.hierarchy.save(filename)
+        hierarchy = ContractionHierarchy.load(filename)
+        self.assertEqual(len(hierarchy), 37)
+        self.check_queries(hierarchy)
+        with open(filename, "wb") as outFile:
+            outFile.write(b"\0" * 64)
+        with self.assertRaises(ValueError):
+            ContractionHierarchy.load(filename)
+
+    def test_settles_fewer_nodes(self):
+        graph = grid_graph(20)
+        hierarchy = ContractionHierarchy.build(graph)
+        one_sided, upward = set(), set()
+        path = hierarchy.query('0', '399', upward)
+        self.assertEqual(path[1], 380.0)
+        self.assertEqual(len(path[0]), 39)
+        astar(graph, '0', '399', None, one_sided)
+        self.assertTrue(len(upward) < len(one_sided) / 2)
+
+    def test_faster_than_dijkstra_on_random_grid(self):
+        graph = random_grid_graph(30, 0)
+        hierarchy = ContractionHierarchy.build(graph)
+        rng = random.Random(1)
+        pairs = [(str(rng.randrange(900)), str(rng.randrange(900)))
+                 for _ in range(100)]
+        for start, end in pairs[:20]:
+            path, total, outdoor = hierarchy.query(start, end)
+            self.assertEqual((total, outdoor),
+                             shortest_path(graph, start, end)[1:])
+        times = []
+        for search in (hierarchy.query,
+                       lambda start, end: dijkstra(graph, start, end)):
+            begin = time.time()
+            for start, end in pairs:
+                search(start, end)
+            times.append(time.time() - begin)
+        self.assertTrue(times[0] < times[1] / 2, times)
+
+
+class TestDirectedDfs(TestRouting):
+
+    def find_path(self, start, end, total_dist, outdoor_dist):
+        return directed_dfs(self.graph, start, end, total_dist, outdoor_dist)
+
+    def test_get_best_path_restores_path(self):
+        path = [[], 0, 0]
+        best = get_best_path(self.graph, '2', '9', path, 0, 99999, None)
+        self.assertEqual(best[0], ['2', '4', '10', '13', '9'])
+        self.assertEqual(best[1], shortest_path(self.graph, '2', '9',
+                                                None, 0)[1])
+        self.assertEqual(path, [[], 0, 0])
+        self.assertEqual(get_best_path(self.graph, '8', '50', path, 0,
+                                       99999, None), None)
+
+
+class TestIterativeDfs(TestRouting):
+
+    def find_path(self, start, end, total_dist, outdoor_dist):
+        return iterative_dfs(self.graph, start, end, total_dist, outdoor_dist)
+
+    def test_matches_directed_dfs(self):
+        names = sorted(node.get_name() for node in self.graph.nodes)
+        for start in names[::4]:
+            for end in names[1::3]:
+                for outdoor_dist in (0, 30):
+                    try:
+                        expected = directed_dfs(self.graph, start, end,
+                                                99999, outdoor_dist)
+                    except ValueError:
+                        self.assertRaises(ValueError, iterative_dfs,
+                                          self.graph, start, end, 99999,
+                                          outdoor_dist)
+                        continue
+                    self.assertEqual(iterative_dfs(self.graph, start, end,
+                                                   99999, outdoor_dist),
+                                     expected)
+
+    def test_long_corridor(self):
+        # longer than the recursion limit allows for get_best_path
+        length = sys.getrecursionlimit() + 100
+        graph = Digraph.from_edge_list(
+            [str(i) for i in range(length)], range(length - 1),
+            range(1, length), [1.0] * (length - 1), [0.0] * (length - 1))
+        path = iterative_dfs(graph, '0', str(length - 1), length, 0)
+        self.assertEqual(path, [str(i) for i in range(length)])
+        self.assertEqual(iterative_dfs(graph, '5', '5', 0, 0), ['5'])
+
+
+if __name__ == "__main__":
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestGraph))
+    suite.addTest(unittest.makeSuite(TestSnapshot))
+    suite.addTest(unittest.makeSuite(TestRouting))
+    suite.addTest(unittest.makeSuite(TestPareto))
+    suite.addTest(unittest.makeSuite(TestAStar))
+    suite.addTest(unittest.makeSuite(TestAllPairs))
+    suite.addTest(unittest.makeSuite(TestBatchRouting))
+    suite.addTest(unittest.makeSuite(TestContraction))
+    suite.addTest(unittest.makeSuite(TestDirectedDfs))
+    suite.addTest(unittest.makeSuite(TestIterativeDfs))
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,503 @@
+# 6.0002 Problem Set 2
+# Graph optimization
+#
+# Label-setting and A* shortest paths over a Digraph
+#
+
+import heapq
+from itertools import count
+
+from graph import Node
+
+INFINITY = float('inf')
+# marks a route missing from a RouteCache
+MISSING = object()
+
+
+def node_id(adjacency, name):
+    """Returns the CompactAdjacency id of the building called name, raising
+    a ValueError if it is not in the graph."""
+    i = adjacency.ids.get(Node(name))
+    if i is None:
+        raise ValueError("Node not in graph")
+    return i
+
+
+def cached_route(digraph, key, search):
+    """
+    Returns search() for the query key, a tuple naming the search and its
+    arguments, keeping the answer (including None for no route) in
+    digraph.route_cache until the graph changes. Callers must copy what
+    they hand out, as the cached answer is shared.
+    """
+    key += (digraph.version,)
+    route = digraph.route_cache.get(key, MISSING)
+    if route is MISSING:
+        route = search()
+        digraph.route_cache.put(key, route)
+    return route
+
+
+def dijkstra(digraph, start, end=None):
+    """
+    Single-source shortest total distances with a binary heap.
+
+    Parameters:
+        digraph: Digraph instance
+        start: string
+            Building number at which to start
+        end: string, optional
+            Building number at which the search may stop early
+
+    Returns:
+        A tuple (dist, pred) of lists indexed by CompactAdjacency id: the
+        shortest total distance from start (INFINITY if unreachable) and the
+        previous node id on that path (-1 for start and unreachable nodes).
+        When end is given only the nodes settled before it are final.
+    """
+    adjacency = digraph.get_adjacency()
+    source = node_id(adjacency, start)
+    target = -1 if end is None else node_id(adjacency, end)
+    indptr, indices, total = adjacency.indptr, adjacency.indices, \
+        adjacency.total
+    dist = [INFINITY] * len(adjacency)
+    pred = [-1] * len(adjacency)
+    done = [False] * len(adjacency)
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if done[u]:
+            continue
+        done[u] = True
+        if u == target:
+            break
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            nd = d + total[k]
+            if nd < dist[v]:
+                dist[v] = nd
+                pred[v] = u
+                heapq.heappush(heap, (nd, v))
+    return dist, pred
+
+
+def shortest_path_tree(digraph, start):
+    """
+    Dijkstra on (total, outdoor) pairs compared lexicographically, giving
+    for every building the shortest route from start and, among those, the
+    one with least distance outdoors, i.e. the route shortest_path finds
+    when there is no outdoor limit.
+
+    Returns:
+        A tuple (dist, outside, pred) of lists indexed by CompactAdjacency
+        id: total distance (INFINITY if unreachable), outdoor distance and
+        previous node id (-1 for start and unreachable nodes).
+    """
+    adjacency = digraph.get_adjacency()
+    source = node_id(adjacency, start)
+    indptr, indices = adjacency.indptr, adjacency.indices
+    total, outdoor = adjacency.total, adjacency.outdoor
+    dist = [INFINITY] * len(adjacency)
+    outside = [INFINITY] * len(adjacency)
+    pred = [-1] * len(adjacency)
+    done = [False] * len(adjacency)
+    dist[source] = outside[source] = 0.0
+    heap = [(0.0, 0.0, source)]
+    while heap:
+        d, o, u = heapq.heappop(heap)
+        if done[u]:
+            continue
+        done[u] = True
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            nd = d + total[k]
+            no = o + outdoor[k]
+            if nd < dist[v] or (nd == dist[v] and no < outside[v]):
+                dist[v] = nd
+                outside[v] = no
+                pred[v] = u
+                heapq.heappush(heap, (nd, no, v))
+    return dist, outside, pred
+
+
+def tree_path(adjacency, pred, target):
+    """Returns the building numbers on the route to target in a pred list
+    from dijkstra or shortest_path_tree."""
+    path = []
+    while target != -1:
+        path.append(adjacency.nodes[target].get_name())
+        target = pred[target]
+    return path[::-1]
+
+
+def _labels(adjacency, reachability, source, target, max_total_dist,
+            max_dist_outdoors, expanded=None):
+    """Yields the non-dominated labels (total, outdoor, tie breaker, node,
+    previous label) reaching target, in increasing total distance and
+    decreasing outdoor distance.
+
+    Labels are settled in lexicographic (total, outdoor) order, so one is
+    dominated exactly when a label already settled at its node has no more
+    outdoor distance; the same holds against the labels already yielded at
+    target, which prunes every label that could not improve on them. No
+    label is made for a node whose component cannot reach target. If
+    expanded is given, it receives the ids of the nodes labels settled at."""
+    if max_total_dist is None:
+        max_total_dist = INFINITY
+    if max_dist_outdoors is None:
+        max_dist_outdoors = INFINITY
+    indptr, indices = adjacency.indptr, adjacency.indices
+    total, outdoor = adjacency.total, adjacency.outdoor
+    # component of target, and the components each component reaches
+    goal, component, reach = reachability.component[target], \
+        reachability.component, reachability.reach
+    # least outdoor distance of the labels settled at each node
+    settled = [INFINITY] * len(adjacency)
+    tie = count()
+    heap = [(0.0, 0.0, next(tie), source, None)]
+    while heap:
+        label = heapq.heappop(heap)
+        d, o, _, u, _ = label
+        if o >= settled[u] or o >= settled[target]:
+            continue
+        settled[u] = o
+        if expanded is not None:
+            expanded.add(u)
+        if u == target:
+            yield label
+            continue
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            if not (reach[component[v]] >> goal) & 1:
+                continue
+            nd = d + total[k]
+            no = o + outdoor[k]
+            if nd <= max_total_dist and no <= max_dist_outdoors \
+                    and no < settled[v] and no < settled[target]:
+                heapq.heappush(heap, (nd, no, next(tie), v, label))
+
+
+def _route(adjacency, label):
+    """Returns (path, total distance, outdoor distance) of a label."""
+    d, o = label[0], label[1]
+    path = []
+    while label is not None:
+        path.append(adjacency.nodes[label[3]].get_name())
+        label = label[4]
+    return path[::-1], d, o
+
+
+def shortest_path(digraph, start, end, max_total_dist=None,
+                  max_dist_outdoors=None):
+    """
+    Finds the shortest path from start to end whose total distance does not
+    exceed max_total_dist and whose distance outdoors does not exceed
+    max_dist_outdoors (None for no limit), as in directed_dfs.
+
+    Labels (total, outdoor) are settled in order of total distance. A label
+    reaching a node where an already settled label has no more outdoor
+    distance is dominated and dropped, as is any label breaking a
+    constraint, so the first label settled at end is the answer. Without an
+    outdoor limit this is plain Dijkstra. Answers, including the lack of
+    one, are kept in digraph.route_cache until the graph changes (see
+    cached_route).
+
+    Parameters:
+        digraph: Digraph instance
+        start: string
+            Building number at which to start
+        end: string
+            Building number at which to end
+        max_total_dist: number or None
+            Maximum total distance on a path
+        max_dist_outdoors: number or None
+            Maximum distance spent outdoors on a path
+
+    Returns:
+        A tuple (path, total distance, outdoor distance), the path being a
+        list of building numbers (in strings). Raises a ValueError if either
+        building is not in the graph or no path satisfies the constraints.
+    """
+    adjacency = digraph.get_adjacency()
+    source = node_id(adjacency, start)
+    target = node_id(adjacency, end)
+    if not digraph.get_reachability().reaches(source, target):
+        raise ValueError("No path satisfies the constraints")
+
+    def search():
+        for label in _labels(adjacency, digraph.get_reachability(), source,
+                             target, max_total_dist, max_dist_outdoors):
+            return _route(adjacency, label)
+        return None
+
+    route = cached_route(digraph, ("shortest_path", start, end,
+                                   max_total_dist, max_dist_outdoors), search)
+    if route is None:
+        raise ValueError("No path satisfies the constraints")
+    return list(route[0]), route[1], route[2]
+
+
+def pareto_paths(digraph, start, end, max_total_dist=None,
+                 max_dist_outdoors=None):
+    """
+    Finds every route from start to end that is not dominated on (total
+    distance, outdoor distance): no other route is at most as long and at
+    most as far outdoors while being strictly better on one of them. Routes
+    with exactly the same distances are reported once.
+
+    The routes are kept in digraph.route_cache until the graph changes.
+
+    Parameters:
+        as in shortest_path
+
+    Returns:
+        A list of (path, total distance, outdoor distance) tuples going from
+        the shortest route to the one with least distance outdoors. Raises
+        a ValueError if either building is not in the graph or no path
+        satisfies the constraints.
+    """
+    adjacency = digraph.get_adjacency()
+    source = node_id(adjacency, start)
+    target = node_id(adjacency, end)
+    if not digraph.get_reachability().reaches(source, target):
+        raise ValueError("No path satisfies the constraints")
+    routes = cached_route(
+        digraph, ("pareto_paths", start, end, max_total_dist,
+                  max_dist_outdoors),
+        lambda: [_route(adjacency, label) for label in
+                 _labels(adjacency, digraph.get_reachability(), source,
+                         target, max_total_dist, max_dist_outdoors)])
+    if not routes:
+        raise ValueError("No path satisfies the constraints")
+    return [(list(path), total, outdoor) for path, total, outdoor in routes]
+
+
+def load_coordinates(filename):
+    """
+    Reads a coordinate file with one "building x y" line per building,
+    in the same units as the map distances.
+
+    Returns:
+        A dictionary mapping building numbers (strings) to (x, y) tuples
+    """
+    coordinates = {}
+    with open(filename, "r") as infile:
+        for line in infile:
+            fields = line.split()
+            if fields:
+                coordinates[fields[0]] = (float(fields[1]), float(fields[2]))
+    return coordinates
+
+
+def euclidean_heuristic(digraph, coordinates):
+    """
+    Straight-line distance to the goal scaled by the smallest ratio of an
+    edge's total distance to its straight-line length, so that it never
+    overestimates even on maps whose distances are not to scale. Every
+    building of digraph needs coordinates.
+
+    Returns:
+        A function h(u, target) of CompactAdjacency ids
+    """
+    adjacency = digraph.get_adjacency()
+    points = []
+    for node in adjacency.nodes:
+        if node.get_name() not in coordinates:
+            raise ValueError("No coordinates for " + node.get_name())
+        points.append(coordinates[node.get_name()])
+    scale = INFINITY
+    for u in range(len(adjacency)):
+        for v, total, _ in adjacency.neighbors(u):
+            length = ((points[u][0] - points[v][0]) ** 2 +
+                      (points[u][1] - points[v][1]) ** 2) ** 0.5
+            if length > 0:
+                scale = min(scale, total / length)
+    if scale == INFINITY:
+        scale = 0.0
+
+    def h(u, target):
+        return scale * ((points[u][0] - points[target][0]) ** 2 +
+                        (points[u][1] - points[target][1]) ** 2) ** 0.5
+    return h
+
+
+def landmark_table(digraph, landmarks=None, k=4):
+    """
+    Shortest distances from a few landmark buildings to every building. If
+    landmarks is None, k of them are picked farthest-first starting from
+    the first building.
+
+    Returns:
+        A list of distance lists indexed by CompactAdjacency id
+    """
+    adjacency = digraph.get_adjacency()
+    if landmarks is None:
+        landmarks = []
+        closest = [INFINITY] * len(adjacency)
+        candidate = 0
+        while len(landmarks) < min(k, len(adjacency)):
+            landmarks.append(adjacency.nodes[candidate].get_name())
+            dist = dijkstra(digraph, landmarks[-1])[0]
+            closest = [min(a, b) for a, b in zip(closest, dist)]
+            reached = [(d, i) for i, d in enumerate(closest)
+                       if 0 < d < INFINITY]
+            if not reached:
+                break
+            candidate = max(reached)[1]
+    return [dijkstra(digraph, name)[0] for name in landmarks]
+
+
+def landmark_heuristic(table):
+    """
+    Lower bound d(L, target) - d(L, u) over the landmarks L of table, which
+    follows from the triangle inequality d(L, target) <= d(L, u) + d(u,
+    target).
+
+    Returns:
+        A function h(u, target) of CompactAdjacency ids
+    """
+    def h(u, target):
+        best = 0.0
+        for dist in table:
+            if dist[u] < INFINITY:
+                best = max(best, dist[target] - dist[u])
+        return best
+    return h
+
+
+def astar(digraph, start, end, heuristic=None, expanded=None):
+    """
+    Shortest path from start to end by A*. heuristic(u, target) must be a
+    consistent lower bound on the distance between two CompactAdjacency
+    ids, e.g. from euclidean_heuristic or landmark_heuristic; without one
+    this is Dijkstra stopped at end.
+
+    Parameters:
+        digraph: Digraph instance
+        start: string
+            Building number at which to start
+        end: string
+            Building number at which to end
+        heuristic: function, optional
+        expanded: set, optional
+            If given, receives the ids of the nodes the search settled
+
+    Returns:
+        A tuple (path, total distance, outdoor distance) as in
+        shortest_path. Raises a ValueError if either building is not in the
+        graph or end cannot be reached.
+    """
+    adjacency = digraph.get_adjacency()
+    source = node_id(adjacency, start)
+    target = node_id(adjacency, end)
+    if heuristic is None:
+        heuristic = lambda u, target: 0.0
+    indptr, indices = adjacency.indptr, adjacency.indices
+    total, outdoor = adjacency.total, adjacency.outdoor
+    dist = {source: 0.0}
+    outside = {source: 0.0}
+    pred = {source: -1}
+    done = set()
+    heap = [(heuristic(source, target), source)]
+    while heap:
+        _, u = heapq.heappop(heap)
+        if u in done:
+            continue
+        done.add(u)
+        if u == target:
+            break
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            nd = dist[u] + total[k]
+            if nd < dist.get(v, INFINITY):
+                dist[v] = nd
+                outside[v] = outside[u] + outdoor[k]
+                pred[v] = u
+                h = heuristic(v, target)
+                if h < INFINITY:
+                    heapq.heappush(heap, (nd + h, v))
+    if expanded is not None:
+        expanded.update(done)
+    if target not in done:
+        raise ValueError("No path satisfies the constraints")
+    path = []
+    u = target
+    while u != -1:
+        path.append(adjacency.nodes[u].get_name())
+        u = pred[u]
+    return path[::-1], dist[target], outside[target]
+
+
+def bidirectional_path(digraph, start, end, expanded=None):
+    """
+    Shortest path from start to end by Dijkstra searches from both ends,
+    the one from end running over the reversed adjacency, that stop once
+    the smallest labels left on the two sides add up to no less than the
+    best meeting found. Like shortest_path without limits, ties in total
+    distance go to the route with less distance outdoors, so both return
+    the same distances.
+
+    Parameters:
+        digraph: Digraph instance
+        start: string
+            Building number at which to start
+        end: string
+            Building number at which to end
+        expanded: set, optional
+            If given, receives the ids of the nodes either search settled
+
+    Returns:
+        A tuple (path, total distance, outdoor distance) as in
+        shortest_path. Raises a ValueError if either building is not in the
+        graph or end cannot be reached.
+    """
+    forward = digraph.get_adjacency()
+    backward = forward.reversed()
+    source = node_id(forward, start)
+    target = node_id(forward, end)
+    # per side: adjacency, best (total, outdoor) so far, previous node
+    # towards its own end, settled nodes and heap
+    sides = [(forward, {source: (0.0, 0.0)}, {source: -1}, set(),
+              [(0.0, 0.0, source)]),
+             (backward, {target: (0.0, 0.0)}, {target: -1}, set(),
+              [(0.0, 0.0, target)])]
+    best = (INFINITY, INFINITY)
+    meet = source if source == target else -1
+    if meet != -1:
+        best = (0.0, 0.0)
+    while sides[0][4] and sides[1][4]:
+        top0, top1 = sides[0][4][0], sides[1][4][0]
+        if (top0[0] + top1[0], top0[1] + top1[1]) >= best:
+            break
+        side = 0 if top0 <= top1 else 1
+        adjacency, label, pred, done, heap = sides[side]
+        other = sides[1 - side][1]
+        d, o, u = heapq.heappop(heap)
+        if u in done:
+            continue
+        done.add(u)
+        indptr, indices = adjacency.indptr, adjacency.indices
+        total, outdoor = adjacency.total, adjacency.outdoor
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            new = (d + total[k], o + outdoor[k])
+            if new < label.get(v, best):
+                label[v] = new
+                pred[v] = u
+                heapq.heappush(heap, (new[0], new[1], v))
+                if v in other:
+                    through = (new[0] + other[v][0], new[1] + other[v][1])
+                    if through < best:
+                        best, meet = through, v
+    if expanded is not None:
+        expanded.update(sides[0][3])
+        expanded.update(sides[1][3])
+    if meet == -1:
+        raise ValueError("No path satisfies the constraints")
+    path = tree_path(forward, sides[0][2], meet)
+    u = sides[1][2][meet]
+    while u != -1:
+        path.append(forward.nodes[u].get_name())
+        u = sides[1][2][u]
+    return path, best[0], best[1]